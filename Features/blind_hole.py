@@ -1,4 +1,3 @@
-import random
 import math
 import numpy as np
 import Utils.occ_utils as occ_utils
@@ -9,8 +8,8 @@ from Features.machining_features import MachiningFeature
 
 
 class BlindHole(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 4
         self.bound_type = 4
         self.depth_type = "blind"
@@ -32,7 +31,7 @@ class BlindHole(MachiningFeature):
 
         if hetero:
             # Generate a hole composed of two semi-cylindrical surfaces
-            scale = random.uniform(0.5, 1.5)
+            scale = self.rng.uniform(0.5, 1.5)
             circ = gp_Circ(gp_Ax2(gp_Pnt(center[0], center[1], center[2]), occ_utils.as_occ(normal, gp_Dir)), radius)
             edge1 = BRepBuilderAPI_MakeEdge(circ, 0., scale * math.pi).Edge()
             edge2 = BRepBuilderAPI_MakeEdge(circ, scale * math.pi, 2 * math.pi).Edge()
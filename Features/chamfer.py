@@ -1,4 +1,3 @@
-import random
 from OCC.Core.BRepFilletAPI import BRepFilletAPI_MakeChamfer
 
 import Utils.shape_factory as shape_factory
@@ -7,8 +6,8 @@ from Features.machining_features import MachiningFeature
 
 
 class Chamfer(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names, edges):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, edges, rng=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng)
         self.shifter_type = None
         self.bound_type = None
         self.depth_type = None
@@ -21,13 +20,13 @@ class Chamfer(MachiningFeature):
 
             # random choose an edge to make chamfer
             try:
-                edge = random.choice(self.edges)
+                edge = self.rng.choice(self.edges)
             except IndexError:
                 print("No more edges")
                 break
 
             try:
-                depth = random.uniform(param.chamfer_depth_min, param.chamfer_depth_max)
+                depth = self.rng.uniform(param.chamfer_depth_min, param.chamfer_depth_max)
                 
                 chamfer_maker.Add(depth, edge)
                 shape = chamfer_maker.Shape()
@@ -47,11 +46,12 @@ class Chamfer(MachiningFeature):
                     continue
 
         try:
-            fmap = shape_factory.map_face_before_and_after_feat(self.shape, chamfer_maker)
+            fmap = shape_factory.map_face_before_and_after_feat(self.state, chamfer_maker)
+            state = self.state.derive(shape)
             labels = shape_factory.map_from_shape_and_name(fmap, self.labels,
-                                                           shape, self.feat_names.index('chamfer'), 
+                                                           state, self.feat_names.index('chamfer'), 
                                                            None)
 
-            return shape, labels, self.edges
+            return state.with_labels(labels), self.edges
         except:
-            return self.shape, self.labels, self.edges
+            return self.state, self.edges
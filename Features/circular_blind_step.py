@@ -1,4 +1,3 @@
-import random
 import numpy as np
 
 from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakeEdge, BRepBuilderAPI_MakeWire, BRepBuilderAPI_MakeFace
@@ -10,8 +9,8 @@ from Features.machining_features import MachiningFeature
 
 
 class CircularBlindStep(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 2
         self.bound_type = 2
         self.depth_type = "blind"
@@ -35,8 +34,8 @@ class CircularBlindStep(MachiningFeature):
 
         if hetero:
             # A certain point of the semicircular arc
-            scale_v0 = random.uniform(0.5, 1.0)
-            scale_v2 = random.uniform(0.5, 1.0)
+            scale_v0 = self.rng.uniform(0.5, 1.0)
+            scale_v2 = self.rng.uniform(0.5, 1.0)
             dir_20 = scale_v0 * vec0 + scale_v2 * vec2
             dir_20 = dir_20 / np.linalg.norm(dir_20)
             pt20 = occ_utils.as_occ(bound[1] + dir_20 * radius, gp_Pnt)
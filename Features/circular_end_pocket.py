@@ -1,4 +1,3 @@
-import random
 import math
 import numpy as np
 
@@ -11,8 +10,8 @@ from Features.machining_features import MachiningFeature
 
 
 class CircularEndPocket(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 4
         self.bound_type = 4
         self.depth_type = "blind"
@@ -52,8 +51,8 @@ class CircularEndPocket(MachiningFeature):
 
         if hetero:
             # A certain point of the semicircular arc
-            angle1 = random.uniform(-math.pi / 3, math.pi / 3)
-            angle2 = random.uniform(-math.pi / 3, math.pi / 3)
+            angle1 = self.rng.uniform(-math.pi / 3, math.pi / 3)
+            angle2 = self.rng.uniform(-math.pi / 3, math.pi / 3)
             radius_dir1 = occ_utils.rotate_vector(dir_w, angle1, normal)
             radius_dir2 = occ_utils.rotate_vector(dir_w, angle2, normal)
             pt01 = occ_utils.as_occ(c01 - radius_dir1 * radius, gp_Pnt)
@@ -1,4 +1,3 @@
-import random
 import math
 import numpy as np
 import Utils.occ_utils as occ_utils
@@ -11,8 +10,8 @@ from Features.machining_features import MachiningFeature
 
 
 class CircularThroughSlot(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 1
         self.bound_type = 1
         self.depth_type = "through"
@@ -40,7 +39,7 @@ class CircularThroughSlot(MachiningFeature):
             normal = occ_utils.as_occ(np.cross(edge_dir, radius_dir), gp_Dir)
 
             # A certain point of the semicircular arc
-            angle = random.uniform(-math.pi / 3, math.pi / 3)
+            angle = self.rng.uniform(-math.pi / 3, math.pi / 3)
             radius_dir = occ_utils.rotate_vector(radius_dir, angle, normal)
             pnt3 = occ_utils.as_occ(center + radius_dir * radius, gp_Pnt)
 
@@ -1,4 +1,3 @@
-import random
 import numpy as np
 
 from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakeEdge, BRepBuilderAPI_MakeWire, BRepBuilderAPI_MakeFace
@@ -10,8 +9,8 @@ from Features.machining_features import MachiningFeature
 
 
 class HCircularEndBlindSlot(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 1
         self.bound_type = 1
         self.depth_type = "blind"
@@ -39,10 +38,10 @@ class HCircularEndBlindSlot(MachiningFeature):
         circ2 = gp_Circ(gp_Ax2(occ_utils.as_occ(center2, gp_Pnt), occ_utils.as_occ(normal, gp_Dir)), rect_h)
 
         if hetero:
-            num = random.randint(0, 2)
-            scale_w = random.uniform(0.5, 1.0)
-            scale_h = random.uniform(0.5, 1.0)
-            scale = random.uniform(0.1, 0.9)
+            num = self.rng.randint(0, 2)
+            scale_w = self.rng.uniform(0.5, 1.0)
+            scale_h = self.rng.uniform(0.5, 1.0)
+            scale = self.rng.uniform(0.1, 0.9)
             if num == 0:
                 dir_23 = scale_w * dir_w + scale_h * dir_h
                 dir_23 = dir_23 / np.linalg.norm(dir_23)
@@ -1,5 +1,6 @@
 import random
 import math
+from functools import partial
 import numpy as np
 import numba as nbv
 
@@ -8,15 +9,12 @@ from OCC.Core.gp import gp_Dir
 from OCC.Core.TopoDS import TopoDS_Face
 from OCC.Core.TopLoc import TopLoc_Location
 from OCC.Core.TopExp import topexp
-from OCC.Extend.TopologyUtils import TopologyExplorer
 from OCC.Core.gp import gp_Pnt, gp_Vec
 from OCC.Core.ShapeAnalysis import ShapeAnalysis_Surface
 from OCC.Core.BRep import BRep_Tool
 from OCC.Core.GeomLProp import GeomLProp_SLProps
 from OCC.Core.TopAbs import TopAbs_FORWARD, TopAbs_REVERSED
 from OCC.Core.TopoDS import topods_Face
-from OCC.Core.GeomAbs import GeomAbs_Plane
-from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
 
 import Utils.occ_utils as occ_utils
 import Utils.geom_utils as geom_utils
@@ -24,14 +22,28 @@ import Utils.geom_utils_numba as geom_utils_nb
 import Utils.shape_factory as shape_factory
 import Utils.parameters as param
 import Utils.numba_vec as nbv
+import Utils.trace as trace
+from Utils.shape_state import ShapeState
+from Utils.bound_cache import FaceBounds, probe_region, feature_region
 
 import OCCUtils.edge
 import OCCUtils.face
 
+# number of rays cast at once when probing the depth of blind features
+RAY_BATCH_SIZE = 256
+
 
 class MachiningFeature:
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        self.shape = shape
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        """
+        :param shape: ShapeState of the current shape, a TopoDS_Shape gets a state of its own.
+        :param label_map: Labels of the current shape, those of the ShapeState when one is given.
+        """
+        if not isinstance(shape, ShapeState):
+            shape = ShapeState(shape, label_map)
+        assert label_map is None or label_map is shape.labels, 'labels differ from those of the shape state'
+        self.state = shape
+        self.shape = shape.shape
         self.min_len = min_len
         self.clearance = clearance
         self.bounds = []
@@ -39,21 +51,142 @@ class MachiningFeature:
         self.bound_type = None
         self.points = []
         self.depth_type = None
-        self.labels = label_map
+        self.labels = shape.labels
         self.feat_names = feat_names
         self.feat_type = None
-
-    def _get_bounds(self):
+        # caches shared with the states of the previous and the following shapes
+        self.mesh_cache = shape.mesh_cache
+        self.convexity_cache = shape.convexity_cache
+        self.bound_cache = shape.bound_cache
+        # random.Random of the sample being generated, the random module itself when not given
+        self.rng = rng if rng is not None else random
+        # (x, y, z) size of the stock
+        self.stock_dims = stock_dims
+
+    def _bound_candidates(self, skip_face=None):
+        """Candidate bounds of the bound type, grouped by face.
+
+        :param skip_face: Function telling which faces need no candidates, e.g. because they are cached.
+        :return: {face: [candidate]}, a candidate is the tuple of arguments _evaluate_candidate passes to the
+                 bound function of the bound type. It only holds plain data, so that the candidates cached in the
+                 bound cache do not keep this feature and its shape alive.
+        """
         if self.bound_type == 1:
-            self._bound_1()
+            return self._bound_1(skip_face)
         elif self.bound_type == 2:
-            self._bound_2()
+            return self._bound_2(skip_face)
         elif self.bound_type == 3:
-            self._bound_3()
+            return self._bound_3(skip_face)
         elif self.bound_type == 4:
-            self._bound_inner()
+            return self._bound_inner(skip_face)
         else:
             print(f"Bound type of {self.bound_type} does not exist.")
+            return {}
+
+    def _evaluate_candidate(self, candidate, tri_set):
+        """Bound of a candidate, None if it is too small or not machinable against the TriangleSet tri_set."""
+        if self.bound_type == 1:
+            return self._edge_bound_between(*candidate, tri_set)
+        elif self.bound_type == 2:
+            return self._corner_bound(*candidate, tri_set)
+        elif self.bound_type == 3:
+            return self._u_bound(*candidate, tri_set)
+        elif self.bound_type == 4:
+            return self._inner_bound_at(*candidate, tri_set)
+        else:
+            return None
+
+    def _infeasible_reason(self):
+        """Cheap check whether a bound of the bound type can exist on the current shape.
+
+        Compares the areas and the straight edges of the planar faces with what the bound finders require at least,
+        so a feature it rejects cannot be added, a feature it accepts may still fail.
+        :return: why no bound can exist, None if one may exist
+        """
+        if self.bound_type not in (1, 2, 3, 4):
+            return None
+
+        min_side = param.min_len + param.clearance
+        # radius of the disk the inner bounds keep from the face boundary
+        radius = param.min_len / 2 + param.clearance
+        for face in self.state.planar_faces:
+            if self.bound_type == 4:
+                # with a margin for the discretised boundary the distances are measured to
+                if self.state.face_area(face) >= 0.9 * math.pi * radius ** 2:
+                    return None
+                continue
+
+            lengths = self.state.line_edge_lengths(face)
+            if self.bound_type == 1:
+                # a straight edge long enough for the feature and its clearances
+                if len(lengths) > 0 and lengths[0] >= param.min_len + 2 * param.clearance:
+                    return None
+            elif self.bound_type == 2:
+                # a corner of two straight edges, each at least as long as the sides of the bound
+                if len(lengths) > 1 and lengths[1] >= min_side:
+                    return None
+            elif self.bound_type == 3:
+                # three straight edges, the first side at least as long as the height (the rectangle is measured
+                # along it) and the base as the width, the third side can be short when the first one is slanted
+                if len(lengths) > 2 and lengths[0] >= min_side and lengths[1] >= param.min_len:
+                    return None
+
+        if self.bound_type == 4:
+            return 'no planar face of area {:.1f}'.format(math.pi * radius ** 2)
+
+        return 'no planar face with the straight edges of bound type {}'.format(self.bound_type)
+
+    def _machining_triangles(self):
+        """TriangleSet the candidates are checked against."""
+        if self.bound_type == 4:
+            return self.state.planar_triangles
+
+        return self.state.triangles
+
+    def _get_bounds(self):
+        """Evaluates all candidate bounds."""
+        candidates = self._bound_candidates()
+        tri_set = self._machining_triangles()
+        for face_candidates in candidates.values():
+            for candidate in face_candidates:
+                bound = self._evaluate_candidate(candidate, tri_set)
+                if bound is not None:
+                    self.bounds.append(bound)
+
+    def _face_bounds(self):
+        """FaceBounds of the faces of the current shape, taken from the bound cache when they are still valid."""
+        def cached(face):
+            return self.bound_cache.get(self.bound_type, face, self.mesh_cache.get(face)) is not None
+
+        for face, candidates in self._bound_candidates(skip_face=cached).items():
+            mesh = self.mesh_cache.get(face)
+            normal = self.state.normal(face)
+            self.bound_cache.set(self.bound_type, face, FaceBounds(mesh, candidates, probe_region(mesh.pts, normal)))
+
+        entries = []
+        for face in self.state.faces:
+            entry = self.bound_cache.get(self.bound_type, face, self.mesh_cache.get(face))
+            if entry is not None:
+                entries.append(entry)
+
+        return entries
+
+    def _iter_bounds(self):
+        """Evaluates the candidate bounds in random order, one at a time, each valid bound is also kept in
+        self.bounds.
+        """
+        with trace.stage('bound_search'):
+            entries = self._face_bounds()
+            tri_set = self._machining_triangles()
+        order = [(entry, idx) for entry in entries for idx in range(len(entry))]
+        self.rng.shuffle(order)
+
+        for entry, idx in order:
+            with trace.stage('bound_search'):
+                bound = entry.evaluate(idx, partial(self._evaluate_candidate, tri_set=tri_set))
+            if bound is not None:
+                self.bounds.append(bound)
+                yield bound
 
     def _get_depth(self, bound, triangles):
         """Selects appropiate method for finding depth of feature.
@@ -75,34 +208,34 @@ class MachiningFeature:
         Find bounds of blind depth and randomly selects the depth.
 
         :param bound:
-        :param triangles:
+        :param triangles: TriangleSet of the faces of the current shape
         :return: depth of blind machining feature
         """
         thres = self.min_len + self.clearance
-        depths = []
+        d_min = np.inf
         self.points = geom_utils.points_inside_rect(bound[0], bound[1], bound[2], bound[3], 0.2)
 
-        for pnt in self.points:
-            triangles = np.array(triangles, dtype=np.float64)
-            dpt = geom_utils_nb.ray_triangle_set_intersect(pnt, bound[4], triangles)
-            if dpt < 0.0:
+        # probe the grid in batches so that a too shallow hit stops the search early
+        for start in range(0, self.points.shape[0], RAY_BATCH_SIZE):
+            dpts = triangles.nearest(self.points[start:start + RAY_BATCH_SIZE], bound[4])
+            dpts = dpts[dpts > 0.0]
+            if dpts.shape[0] == 0:
                 continue
-            if dpt + 1e-6 < thres:
+            if dpts.min() + 1e-6 < thres:
                 return np.NINF
 
-            depths.append(dpt)
-
-        depths.sort()
+            d_min = min(d_min, dpts.min())
 
-        d_min = min(depths)
-
-        if d_min < 0:
+        if d_min == np.inf:
             return np.NINF
 
-        return random.uniform(self.min_len, d_min - self.clearance)
+        return self.rng.uniform(self.min_len, d_min - self.clearance)
 
     def _depth_through(self):
-        depth = max([param.stock_dim_x, param.stock_dim_y, param.stock_dim_z])
+        if self.stock_dims is None:
+            # no stock size given, deep enough for any stock
+            return max([param.stock_max_x, param.stock_max_y, param.stock_max_z])
+        depth = max(self.stock_dims)
         return depth
 
     def _shifter2(self, max_bound):
@@ -113,18 +246,18 @@ class MachiningFeature:
         dir_w = dir_w / old_w
         dir_h = dir_h / old_h
 
-        scale_w = random.uniform(0.1, 1.0)
-        scale_h = random.uniform(0.1, 1.0)
+        scale_w = self.rng.uniform(0.1, 1.0)
+        scale_h = self.rng.uniform(0.1, 1.0)
         new_w = max(param.min_len, old_w * scale_w)
         new_h = max(param.min_len, old_h * scale_h)
 
         if self.shifter_type == 1:
-            offset_w = random.uniform(0.0, old_w - new_w)
+            offset_w = self.rng.uniform(0.0, old_w - new_w)
             max_bound[1] = max_bound[1] + offset_w * dir_w
 
         if self.shifter_type == 4:
-            offset_w = random.uniform(0.0, old_w - new_w)
-            offset_h = random.uniform(0.0, old_h - new_h)
+            offset_w = self.rng.uniform(0.0, old_w - new_w)
+            offset_h = self.rng.uniform(0.0, old_h - new_h)
             max_bound[1] = max_bound[1] + offset_w * dir_w + offset_h * dir_h
 
         max_bound[0] = max_bound[1] + new_h * dir_h
@@ -145,19 +278,19 @@ class MachiningFeature:
         dir_w = nbv.div(old_w, dir_w)
         dir_h = nbv.div(old_h, dir_h)
 
-        scale_w = random.uniform(0.1, 1.0)
-        scale_h = random.uniform(0.1, 1.0)
+        scale_w = self.rng.uniform(0.1, 1.0)
+        scale_h = self.rng.uniform(0.1, 1.0)
         new_w = max(param.min_len, old_w * scale_w)
         new_h = max(param.min_len, old_h * scale_h)
 
         if self.shifter_type == 1:
-            offset_w = random.uniform(0.0, old_w - new_w)
+            offset_w = self.rng.uniform(0.0, old_w - new_w)
             new_dir_w = nbv.mul(offset_w, dir_w)
             bounds_max[1] = nbv.add(bounds_max[1], new_dir_w)
 
         if self.shifter_type == 4:
-            offset_w = random.uniform(0.0, old_w - new_w)
-            offset_h = random.uniform(0.0, old_h - new_h)
+            offset_w = self.rng.uniform(0.0, old_w - new_w)
+            offset_h = self.rng.uniform(0.0, old_h - new_h)
             new_dir_w = nbv.mul(offset_w, dir_w)
             new_dir_h = nbv.mul(offset_h, dir_h)
             bounds_max[1] = nbv.add(nbv.add(bounds_max[1], new_dir_w), new_dir_h)
@@ -176,51 +309,9 @@ class MachiningFeature:
         return bounds_max
 
     def _triangulation_from_face(self, face):
-        aLoc = TopLoc_Location()
-        aTriangulation = BRep_Tool().Triangulation(face, aLoc)
-        aTrsf = aLoc.Transformation()
-
-        aNodes = aTriangulation.Nodes()
-        aTriangles = aTriangulation.Triangles()
-
-        pts = []
-        for i in range(1, aTriangulation.NbNodes() + 1):
-            pt = aNodes.Value(i)
-            pt.Transform(aTrsf)
-            pts.append([pt.X(), pt.Y(), pt.Z()])
-
-        triangles = []
-        vt_map = {}
-        et_map = {}
-        for i in range(1, aTriangulation.NbTriangles() + 1):
-            n1, n2, n3 = aTriangles.Value(i).Get()
-            pids = [n1 - 1, n2 - 1, n3 - 1]
-            pids.sort()
-            triangles.append((pids[0], pids[1], pids[2]))
-
-            for pid in pids:
-                if pid in vt_map:
-                    vt_map[pid].append(i - 1)
-                else:
-                    vt_map[pid] = [i - 1]
-
-            edges = [(pids[0], pids[1]), (pids[0], pids[2]), (pids[1], pids[2])]
-            for edge in edges:
-                if edge in et_map:
-                    et_map[edge].append(i - 1)
-                else:
-                    et_map[edge] = [i - 1]
-
-        return pts, triangles, vt_map, et_map
-
-    def _triangles_from_faces(self, faces):
-        tri_list = []
-        for face in faces:
-            pts, triangles, vt_map, et_map = self._triangulation_from_face(face)
-            for tri in triangles:
-                tri_list.append((pts[tri[0]], pts[tri[1]], pts[tri[2]]))
+        mesh = self.mesh_cache.get(face)
 
-        return tri_list
+        return mesh.pts, mesh.triangles, mesh.vt_map, mesh.et_map
 
     def _rect_size(self, rect):
         dir_w = nbv.sub(rect[1], rect[2])
@@ -230,24 +321,17 @@ class MachiningFeature:
 
         return width, height
 
-    def _face_filter(self, shape, num_edges):
+    def _face_filter(self, num_edges):
+        topo_index = self.state.topology
         result = []
-        faces = occ_utils.list_face(shape)
-
-        for face in faces:
-            surf = BRepAdaptor_Surface(face, True)
-            surf_type = surf.GetType()
-
-            if surf_type != GeomAbs_Plane:
-                continue
 
+        for face in self.state.planar_faces:
             if num_edges == 0:
                 result.append(face)
                 continue
 
-            face_util = OCCUtils.face.Face(face)
-            normal = occ_utils.as_list(occ_utils.normal_to_face_center(face))
-            for wire in face_util.topo.wires():
+            normal = self.state.normal(face)
+            for wire in topo_index.wires_from_face(face):
                 edges = [edge for edge in OCCUtils.face.WireExplorer(wire).ordered_edges()]
                 if len(edges) < 4:
                     continue
@@ -261,7 +345,7 @@ class MachiningFeature:
                     else:
                         good_edge.append(True)
 
-                    face_adjacent = occ_utils.face_adjacent(shape, face, edge)
+                    face_adjacent = topo_index.face_adjacent(face, edge)
                     assert face_adjacent is not None
 
                 for i in range(len(edges)):
@@ -281,7 +365,6 @@ class MachiningFeature:
                     pnt = np.array(occ_utils.as_list(topexp.FirstVertex(edges[i], True)))
                     pntj = np.array(occ_utils.as_list(topexp.FirstVertex(edges[j], True)))
                     pntk = np.array(occ_utils.as_list(topexp.FirstVertex(edges[k], True)))
-                    normal = np.array(normal, dtype=np.float64)
                     if not geom_utils_nb.point_in_polygon(pnt, np.array([pntj, pntk]), normal=normal):
                         continue
 
@@ -332,51 +415,67 @@ class MachiningFeature:
 
         return sample_points
 
-    def _bound_inner(self):
-        fe_list = self._face_filter(self.shape, num_edges=0)
+    def _bound_inner(self, skip_face=None):
+        fe_list = self._face_filter(num_edges=0)
 
+        candidates = {}
         for face in fe_list:
-            normal = np.array(occ_utils.as_list(occ_utils.normal_to_face_center(face)))
-            sample_pnts = np.array(self._sample_points_inside_face(face))
+            if skip_face is not None and skip_face(face):
+                continue
+            face_candidates = candidates.setdefault(face, [])
+            normal = self.state.normal(face)
+            sample_pnts = np.array(self._sample_points_inside_face(face), dtype=np.float64)
 
-            edges = occ_utils.list_edge(face)
+            segs = occ_utils.edges_to_segments(occ_utils.list_edge(face))
+            if sample_pnts.shape[0] == 0 or segs.shape[0] == 0:
+                continue
 
-            for apnt in sample_pnts:
-                # Finds apnt closest to edge of B-Rep face
-                dist, pnt = occ_utils.dist_point_to_edges(apnt, edges)
-                pnt = np.array(pnt)
+            # Finds the points on the edges of the B-Rep face closest to the sample points
+            dists, nearest_pnts = geom_utils_nb.points_to_segments_dist(sample_pnts, segs)
 
+            for apnt, dist, pnt in zip(sample_pnts, dists, nearest_pnts):
                 if dist >= param.min_len / 2 + param.clearance:
-                    dir_w = nbv.sub(pnt, apnt)
-                    len_w = nbv.norm(dir_w)
-                    unit_dir_w = nbv.div(len_w, dir_w)
-                    dir_h = nbv.cross(unit_dir_w, normal)
-                    dist -= param.clearance
+                    face_candidates.append((apnt, dist, pnt, normal))
 
-                    part_a = nbv.sub(nbv.mul(dist, unit_dir_w), apnt)
-                    part_b = nbv.add(nbv.mul(dist, unit_dir_w), apnt)
-                    part_c = nbv.mul(dist, dir_h)
+        return candidates
 
-                    pnt0 = nbv.sub(part_c, part_a)
-                    pnt1 = nbv.add(part_c, part_a)
-                    pnt2 = nbv.add(part_c, part_b)
-                    pnt3 = nbv.sub(part_c, part_b)
+    def _inner_bound_at(self, apnt, dist, pnt, normal, triangles):
+        """Square bound centered at apnt, pnt is the point of the face boundary nearest to it at distance dist."""
+        dir_w = nbv.sub(pnt, apnt)
+        len_w = nbv.norm(dir_w)
+        unit_dir_w = nbv.div(len_w, dir_w)
+        dir_h = nbv.cross(unit_dir_w, normal)
+        dist -= param.clearance
 
-                    bound = np.array((pnt0, pnt1, pnt2, pnt3, -normal))
+        part_a = nbv.sub(nbv.mul(dist, unit_dir_w), apnt)
+        part_b = nbv.add(nbv.mul(dist, unit_dir_w), apnt)
+        part_c = nbv.mul(dist, dir_h)
 
-                    intersect = self._possible_to_machine(bound, normal, fe_list)
-                    if not intersect:
-                        self.bounds.append(bound)
+        pnt0 = nbv.sub(part_c, part_a)
+        pnt1 = nbv.add(part_c, part_a)
+        pnt2 = nbv.add(part_c, part_b)
+        pnt3 = nbv.sub(part_c, part_b)
 
-    def _bound_1(self):
-        concave_edges = self._find_concave_edges(self.shape)
-        fe_list = self._face_filter(self.shape, num_edges=1)
-        faces = occ_utils.list_face(self.shape)
+        bound = np.array((pnt0, pnt1, pnt2, pnt3, -normal))
 
+        if self._possible_to_machine(bound, normal, triangles):
+            return None
+
+        return bound
+
+    def _bound_1(self, skip_face=None):
+        concave_edges = self._find_concave_edges()
+        fe_list = self._face_filter(num_edges=1)
+
+        candidates = {}
         for item in fe_list:
             face = item[0]
             edge = item[1]
 
+            if skip_face is not None and skip_face(face):
+                continue
+            face_candidates = candidates.setdefault(face, [])
+
             # Only allow feature creation on convex edges
             if edge in concave_edges:
                 continue
@@ -388,7 +487,7 @@ class MachiningFeature:
                 if len(et_map[et]) == 1:
                     segs.append([pts[et[0]], pts[et[1]]])
             pts = np.asarray(pts)
-            normal = np.array(occ_utils.as_list(occ_utils.normal_to_face_center(face)))
+            normal = self.state.normal(face)
 
             pnt1 = np.array(occ_utils.as_list(topexp.FirstVertex(edge, True)))
             pnt2 = np.array(occ_utils.as_list(topexp.LastVertex(edge, True)))
@@ -430,24 +529,35 @@ class MachiningFeature:
             pts = np.append(pts, inter_pnts, axis=0)
 
             inter_pnts = np.array(inter_pnts, dtype=np.float64)
+            heights = np.linalg.norm(inter_pnts - sample_pnts, axis=1)
+            min_height = param.min_len + param.clearance
 
-            for i in range(sample_pnts.shape[0] - 1):
+            # pairs whose rectangle cannot reach the minimum height are left out
+            for i, j in geom_utils.rect_candidate_pairs(heights, min_height):
                 vec1 = nbv.sub(sample_pnts[i], inter_pnts[i])
+                vec2 = nbv.sub(sample_pnts[j], inter_pnts[j])
+                face_candidates.append((sample_pnts[i], vec1, sample_pnts[j], vec2, pts, normal))
 
-                for j in range(i + 1, sample_pnts.shape[0]):
-                    vec2 = nbv.sub(sample_pnts[j], inter_pnts[j])
-                    verts = np.array([sample_pnts[i] + vec1, sample_pnts[i], sample_pnts[j], sample_pnts[j] + vec2])
-                    bound = geom_utils_nb.search_rect_inside_bound_1(verts, vec1, vec2, pts)
-                    if bound is not None:
-                        # Ensure that there is clearance from the opposite edge to the context edge
-                        w, h = self._rect_size(bound)
-                        if h >= param.min_len + param.clearance:
-                            bound = self._shrink_bound_1(bound)
-                            bound = np.append(bound, [-normal], axis=0)
-
-                            intersect = self._possible_to_machine(bound, normal, faces)
-                            if not intersect:
-                                self.bounds.append(bound)
+        return candidates
+
+    def _edge_bound_between(self, pnt1, vec1, pnt2, vec2, pts, normal, tri_set):
+        """Largest rectangle of _bound_1 on the context edge segment pnt1-pnt2."""
+        verts = np.array([pnt1 + vec1, pnt1, pnt2, pnt2 + vec2])
+        bound = geom_utils_nb.search_rect_inside_bound_1(verts, vec1, vec2, pts)
+        if bound is None:
+            return None
+
+        # Ensure that there is clearance from the opposite edge to the context edge
+        w, h = self._rect_size(bound)
+        if not h >= param.min_len + param.clearance:
+            return None
+
+        bound = self._shrink_bound_1(bound)
+        bound = np.append(bound, [-normal], axis=0)
+        if self._possible_to_machine(bound, normal, tri_set):
+            return None
+
+        return bound
 
     def _shrink_bound_1(self, bound):
         dir_h_1 = nbv.sub(bound[1], bound[0])
@@ -501,17 +611,21 @@ class MachiningFeature:
 
         return bound
 
-    def _bound_2(self):
-        concave_edges = self._find_concave_edges(self.shape)
+    def _bound_2(self, skip_face=None):
+        concave_edges = self._find_concave_edges()
 
-        fe_list = self._face_filter(self.shape, num_edges=2)
-        faces = occ_utils.list_face(self.shape)
+        fe_list = self._face_filter(num_edges=2)
 
+        candidates = {}
         for item in fe_list:
             face = item[0]
             edge1 = item[1]
             edge2 = item[2]
 
+            if skip_face is not None and skip_face(face):
+                continue
+            face_candidates = candidates.setdefault(face, [])
+
             if edge1 in concave_edges or edge2 in concave_edges:
                 continue
 
@@ -524,42 +638,52 @@ class MachiningFeature:
             if edge_angle != 90.0:
                 continue
 
-            pts, triangles, vt_map, et_map = self._triangulation_from_face(face)
-            pts = np.asarray(pts)
+            face_candidates.append((face, pnt0, pnt1, pnt2))
 
-            vec0 = nbv.sub(pnt1, pnt0)
-            vec2 = nbv.sub(pnt1, pnt2)
+        return candidates
 
-            verts = np.array([pnt1 + vec0, pnt1, pnt1 + vec2, pnt1 + vec0 + vec2])
-            bound = geom_utils_nb.search_rect_inside_bound_2(verts, vec0, vec2, pts)
+    def _corner_bound(self, face, pnt0, pnt1, pnt2, tri_set):
+        """Largest rectangle of _bound_2 in the corner pnt0-pnt1-pnt2 of a face."""
+        pts, triangles, vt_map, et_map = self._triangulation_from_face(face)
+        pts = np.asarray(pts)
 
-            if bound is not None:
-                w, h = self._rect_size(bound)
-                if w >= param.min_len + param.clearance and h >= param.min_len + param.clearance:
-                    normal = np.array(occ_utils.as_list(occ_utils.normal_to_face_center(face)))
-                    bound = self._shrink_bound_2(bound)
-                    bound = np.append(bound, [-normal], axis=0)
+        vec0 = nbv.sub(pnt1, pnt0)
+        vec2 = nbv.sub(pnt1, pnt2)
+
+        verts = np.array([pnt1 + vec0, pnt1, pnt1 + vec2, pnt1 + vec0 + vec2])
+        bound = geom_utils_nb.search_rect_inside_bound_2(verts, vec0, vec2, pts)
+        if bound is None:
+            return None
 
-                    intersect = self._possible_to_machine(bound, normal, faces)
-                    if not intersect:
-                        self.bounds.append(bound)
+        w, h = self._rect_size(bound)
+        if not (w >= param.min_len + param.clearance and h >= param.min_len + param.clearance):
+            return None
 
-    def _bound_3(self):
-        concave_edges = self._find_concave_edges(self.shape)
-        fe_list = self._face_filter(self.shape, num_edges=3)
-        faces = occ_utils.list_face(self.shape)
+        normal = self.state.normal(face)
+        bound = self._shrink_bound_2(bound)
+        bound = np.append(bound, [-normal], axis=0)
+        if self._possible_to_machine(bound, normal, tri_set):
+            return None
 
+        return bound
+
+    def _bound_3(self, skip_face=None):
+        concave_edges = self._find_concave_edges()
+        fe_list = self._face_filter(num_edges=3)
+
+        candidates = {}
         for item in fe_list:
             face = item[0]
             edge1 = item[1]
             edge2 = item[2]
             edge3 = item[3]
 
-            if edge1 in concave_edges or edge2 in concave_edges or edge3 in concave_edges:
+            if skip_face is not None and skip_face(face):
                 continue
+            face_candidates = candidates.setdefault(face, [])
 
-            pts, triangles, vt_map, et_map = self._triangulation_from_face(face)
-            pts = np.asarray(pts)
+            if edge1 in concave_edges or edge2 in concave_edges or edge3 in concave_edges:
+                continue
 
             v0 = np.array(occ_utils.as_list(topexp.FirstVertex(edge1, True)))
             v1 = np.array(occ_utils.as_list(topexp.FirstVertex(edge2, True)))
@@ -567,48 +691,40 @@ class MachiningFeature:
             v3 = np.array(occ_utils.as_list(topexp.LastVertex(edge3, True)))
 
             vertices = np.array([v0, v1, v2, v3], dtype=np.float64)
-            bound = geom_utils_nb.search_rect_inside_bound_3(vertices, pts)
+            face_candidates.append((face, vertices))
 
-            if bound is not None:
-                w, h = self._rect_size(bound)
+        return candidates
 
-                if w >= param.min_len and h >= param.min_len + param.clearance:
-                    normal = np.array(occ_utils.as_list(occ_utils.normal_to_face_center(face)))
-                    bound = self._shrink_bound_3(bound)
-                    bound = np.append(bound, [-normal], axis=0)
-                    intersect = self._possible_to_machine(bound, normal, faces)
-                    if not intersect:
-                        self.bounds.append(bound)
+    def _u_bound(self, face, vertices, tri_set):
+        """Largest rectangle of _bound_3 between the three edges v0-v1-v2-v3 of a face."""
+        pts, triangles, vt_map, et_map = self._triangulation_from_face(face)
+        pts = np.asarray(pts)
 
-    def _possible_to_machine(self, bound, normal, faces):
-        intersect = False
+        bound = geom_utils_nb.search_rect_inside_bound_3(vertices, pts)
+        if bound is None:
+            return None
 
+        w, h = self._rect_size(bound)
+        if not (w >= param.min_len and h >= param.min_len + param.clearance):
+            return None
+
+        normal = self.state.normal(face)
+        bound = self._shrink_bound_3(bound)
+        bound = np.append(bound, [-normal], axis=0)
+        if self._possible_to_machine(bound, normal, tri_set):
+            return None
+
+        return bound
+
+    def _possible_to_machine(self, bound, normal, triangles):
         centroid_x = (bound[0][0] + bound[1][0] + bound[2][0] + bound[3][0]) / 4
         centroid_y = (bound[0][1] + bound[1][1] + bound[2][1] + bound[3][1]) / 4
         centroid_z = (bound[0][2] + bound[1][2] + bound[2][2] + bound[3][2]) / 4
         centroid = (centroid_x, centroid_y, centroid_z)
 
-        points = np.array((bound[0], bound[1], bound[2], bound[3], centroid))
-
-        for face in faces:
-            tri_list = []
-            pts, triangles, vt_map, et_map = self._triangulation_from_face(face)
+        points = np.array((bound[0], bound[1], bound[2], bound[3], centroid), dtype=np.float64)
 
-            for tri in triangles:
-                tri_list.append((pts[tri[0]], pts[tri[1]], pts[tri[2]]))
-
-            for pnt in points:
-                tri_array = np.array(tri_list, dtype=np.float64)
-                dpt = geom_utils_nb.ray_triangle_set_intersect(pnt, normal, tri_array)
-
-                if dpt != np.NINF:
-                    intersect = True
-                    continue
-
-            if intersect:
-                continue
-
-        return intersect
+        return triangles.any_hit(points, normal)
 
     def _angle_between_edges(self, pnt0, pnt1, pnt2):
         vec_a = pnt1 - pnt0
@@ -624,16 +740,17 @@ class MachiningFeature:
 
         return angle
 
-    def _find_concave_edges(self, shape):
+    def _find_concave_edges(self):
+        topo_index = self.state.topology
         concave = []
 
-        topo = TopologyExplorer(shape)
-        for edge in topo.edges():
-            faces = list(topo.faces_from_edge(edge))
-            if len(faces) == 1:
-                continue
-
-            s = edge_dihedral(edge, faces)
+        for edge in self.state.unique_edges:
+            s = self.convexity_cache.get(edge)
+            if s is None:
+                faces = topo_index.faces_from_edge(edge)
+                # boundary edges are neither convex nor concave
+                s = 0 if len(faces) == 1 else edge_dihedral(edge, faces)
+                self.convexity_cache.set(edge, s)
 
             if s == -1:
                 concave.append(edge)
@@ -643,15 +760,28 @@ class MachiningFeature:
     def _add_sketch(self, bound, hetero):
         return None
 
-    def _apply_feature(self, old_shape, old_labels, feat_type, feat_face, depth_dir, bound_max):
-        feature_maker = BRepFeat_MakePrism()
-        feature_maker.Init(old_shape, feat_face, TopoDS_Face(), occ_utils.as_occ(depth_dir, gp_Dir), False, False)
-        feature_maker.Build()
+    def _apply_feature(self, old_state, feat_type, feat_face, depth_dir, bound_max):
+        """Cuts the prism of the feature sketch out of the shape of old_state and returns the state of the result."""
+        with trace.stage('make_prism'):
+            feature_maker = BRepFeat_MakePrism()
+            feature_maker.Init(old_state.shape, feat_face, TopoDS_Face(), occ_utils.as_occ(depth_dir, gp_Dir), False, False)
+            feature_maker.Build()
 
-        feature_maker.Perform(np.linalg.norm(depth_dir))
-        shape = feature_maker.Shape()
+            feature_maker.Perform(np.linalg.norm(depth_dir))
+            state = old_state.derive(feature_maker.Shape())
         # find map between modified faces on old shape and new generated faces
-        fmap = shape_factory.map_face_before_and_after_feat(old_shape, feature_maker)
+        with trace.stage('face_map'):
+            fmap = shape_factory.map_face_before_and_after_feat(old_state, feature_maker)
+        # only the triangulations of modified or deleted faces become stale
+        old_faces = old_state.faces
+        stale_faces = [face for face in old_faces if fmap.get(face) != [face]]
+        self.mesh_cache.invalidate(stale_faces)
+        # the convexity of an edge changes with the faces around it, so the edges of the modified and deleted
+        # faces, and those of the faces generated by the prism, are classified again
+        old_faces = set(old_faces)
+        self.convexity_cache.invalidate(stale_faces + [face for face in state.faces if face not in old_faces])
+        # candidates of the untouched faces are kept, their machinability is checked again near the feature
+        self.bound_cache.invalidate(stale_faces, feature_region(bound_max, depth_dir))
         # bottom face is parallel to the depth direction
         # special case bottom face is normal to the depth direction
         if self.feat_type == 'rectangular_through_slot' or \
@@ -663,71 +793,97 @@ class MachiningFeature:
             feat_dir = occ_utils.as_occ(dir_h, gp_Dir)
         else:
             feat_dir = occ_utils.as_occ(depth_dir, gp_Dir)
-        new_labels = shape_factory.map_from_shape_and_name(fmap, old_labels, shape, self.feat_names.index(feat_type),
-                                                           feat_dir)
+        with trace.stage('face_map'):
+            new_labels = shape_factory.map_from_shape_and_name(fmap, old_state.labels, state,
+                                                               self.feat_names.index(feat_type), feat_dir)
 
-        return shape, new_labels
+        return state.with_labels(new_labels)
 
     def add_feature(self, bounds, subset, find_bounds=True):
         """Adds machining feature to current shape.
 
+        Unless param.feasibility_check is off, the bound search is skipped when _infeasible_reason tells that no
+        bound can exist on the shape, the reason is reported to the trace.
+
         :param bounds:
         :param subset:
-        :param find_bounds:
-        :return:
+        :param find_bounds: Search the bounds on the current shape instead of using the given ones. The candidates are
+                            evaluated lazily, unless param.exhaustive_bounds is set.
+        :return: ShapeState of the new shape, the given one if the feature failed, and the bounds
         """
         if subset == 'train':
             hetero = False
         else:
-            hetero = random.choice([True, False])
-        try:
-            if find_bounds is True:
-                self._get_bounds()
-            else:
-                self.bounds = bounds
+            hetero = self.rng.choice([True, False])
+        if find_bounds is True and param.feasibility_check:
+            with trace.stage('feasibility'):
+                reason = self._infeasible_reason()
+            if reason is not None:
+                trace.fail('infeasible: ' + reason)
+                return self.state, bounds
 
-            if len(self.bounds) < 1:
-                return self.shape, self.labels, self.bounds
+        with trace.stage('triangulate'):
+            self.state.triangulate()
 
+        try:
             feat_face = None
-            faces = occ_utils.list_face(self.shape)
-            triangles = self._triangles_from_faces(faces)
-
-            random.shuffle(self.bounds)
             depth = np.NINF
 
-            try_cnt = 0
-            while try_cnt < len(self.bounds):
-                bound_max = random.choice(self.bounds)
+            if find_bounds is True and not param.exhaustive_bounds:
+                # candidates are only evaluated until one of them takes the feature
+                with trace.stage('triangle_set'):
+                    triangles = self.state.triangles
+                bound_iter = self._iter_bounds()
+            else:
+                if find_bounds is True:
+                    with trace.stage('bound_search'):
+                        self._get_bounds()
+                else:
+                    self.bounds = bounds
+
+                if len(self.bounds) < 1:
+                    trace.fail('no bounds')
+                    return self.state, self.bounds
+
+                with trace.stage('triangle_set'):
+                    triangles = self.state.triangles
+                self.rng.shuffle(self.bounds)
+                bound_iter = (self.rng.choice(self.bounds) for _ in range(len(self.bounds)))
+
+            for bound_max in bound_iter:
                 bound_max = self._shifter(bound_max)
 
-                depth = self._get_depth(bound_max, triangles)
+                with trace.stage('depth_probe'):
+                    depth = self._get_depth(bound_max, triangles)
 
                 if depth <= 0:
-                    try_cnt += 1
                     continue
 
-                feat_face = self._add_sketch(bound_max, hetero)
-                try_cnt = len(self.bounds)
+                with trace.stage('sketch'):
+                    feat_face = self._add_sketch(bound_max, hetero)
+                break
+
+            if len(self.bounds) < 1:
+                trace.fail('no bounds')
+                return self.state, self.bounds
 
         except Exception as e:
             print(e)
-            return self.shape, self.labels, bounds
+            trace.fail('exception ' + type(e).__name__)
+            return self.state, bounds
 
         if feat_face is None:
-            return self.shape, self.labels, bounds
+            trace.fail('no valid depth')
+            return self.state, bounds
 
         feat_dir = bound_max[4]
-        shape, labels = self._apply_feature(self.shape, self.labels, self.feat_type,
-                                            feat_face, feat_dir * depth, bound_max)
-
-        topo = TopologyExplorer(shape)
-
-        if topo.number_of_solids() > 1:
-            return self.shape, self.labels, bounds
+        state = self._apply_feature(self.state, self.feat_type, feat_face, feat_dir * depth, bound_max)
 
-        return shape, labels, self.bounds
+        if state.num_solids > 1:
+            trace.fail('multiple solids')
+            return self.state, bounds
 
+        return state, self.bounds
 
 def ask_point_uv2(xyz, face):
     """
@@ -1,4 +1,3 @@
-import random
 import math
 import numpy as np
 
@@ -10,8 +9,8 @@ from Features.machining_features import MachiningFeature
 
 
 class ORing(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 4
         self.bound_type = 4
         self.depth_type = "blind"
@@ -30,11 +29,11 @@ class ORing(MachiningFeature):
         outer_r = min(width / 2, height / 2)
         center = (bound[0] + bound[1] + bound[2] + bound[3]) / 4
 
-        inner_r = random.uniform(outer_r / 3, outer_r - 0.2)
+        inner_r = self.rng.uniform(outer_r / 3, outer_r - 0.2)
 
         if hetero:
-            scale1 = random.uniform(0.5, 1.5)
-            scale2 = random.uniform(0.5, 1.5)
+            scale1 = self.rng.uniform(0.5, 1.5)
+            scale2 = self.rng.uniform(0.5, 1.5)
             circ = gp_Circ(gp_Ax2(gp_Pnt(center[0], center[1], center[2]), normal), outer_r)
             edge1 = BRepBuilderAPI_MakeEdge(circ, 0., scale1 * math.pi).Edge()
             edge2 = BRepBuilderAPI_MakeEdge(circ, scale1 * math.pi, 2 * math.pi).Edge()
@@ -1,4 +1,3 @@
-import random
 import numpy as np
 import Utils.occ_utils as occ_utils
 
@@ -6,8 +5,8 @@ from Features.machining_features import MachiningFeature
 
 
 class RectangularBlindStep(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 2
         self.bound_type = 2
         self.depth_type = "blind"
@@ -15,8 +14,8 @@ class RectangularBlindStep(MachiningFeature):
 
     def _add_sketch(self, bound, hetero):
         if hetero:
-            scale = random.uniform(0.1, 0.9)
-            num = random.randint(0, 1)
+            scale = self.rng.uniform(0.1, 0.9)
+            num = self.rng.randint(0, 1)
             if num == 0:
                 pt = np.array([scale * x + (1 - scale) * y for x, y in zip(bound[2], bound[3])])
                 return occ_utils.face_polygon([bound[0], bound[1], bound[2], pt, bound[3]])
@@ -1,12 +1,11 @@
-import random
 import numpy as np
 import Utils.occ_utils as occ_utils
 from Features.machining_features import MachiningFeature
 
 
 class RectangularThroughStep(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 3
         self.bound_type = 3
         self.depth_type = "blind"
@@ -14,7 +13,7 @@ class RectangularThroughStep(MachiningFeature):
 
     def _add_sketch(self, bound, hetero):
         if hetero:
-            scale = random.uniform(0.1, 0.9)
+            scale = self.rng.uniform(0.1, 0.9)
             pt = np.array([scale * x + (1 - scale) * y for x, y in zip(bound[3], bound[0])])
             return occ_utils.face_polygon([bound[0], bound[1], bound[2], bound[3], pt])
 
@@ -1,4 +1,3 @@
-import random
 from OCC.Core.BRepFilletAPI import BRepFilletAPI_MakeFillet
 from OCC.Core.GProp import GProp_GProps
 from OCC.Core._BRepGProp import brepgprop_SurfaceProperties
@@ -19,8 +18,8 @@ def ask_surface_area(f):
 
 
 class Round(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names, edges):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, edges, rng=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng)
         self.shifter_type = None
         self.bound_type = None
         self.depth_type = None
@@ -39,14 +38,14 @@ class Round(MachiningFeature):
         self.edges = new_edges
 
         while len(self.edges) > 0:
-            edge = random.choice(self.edges)
+            edge = self.rng.choice(self.edges)
             e_util = OCCUtils.edge.Edge(edge)
             max_radius = e_util.length() / 10
 
             if max_radius > param.round_radius_max:
                 max_radius = param.round_radius_max
 
-            radius = random.uniform(param.round_radius_min, max_radius)
+            radius = self.rng.uniform(param.round_radius_min, max_radius)
 
             try:
                 fillet_maker.Add(radius, edge)
@@ -59,12 +58,13 @@ class Round(MachiningFeature):
                 continue
 
         try:
-            fmap = shape_factory.map_face_before_and_after_feat(self.shape, fillet_maker)
+            fmap = shape_factory.map_face_before_and_after_feat(self.state, fillet_maker)
+            state = self.state.derive(shape)
             labels = shape_factory.map_from_shape_and_name(fmap, self.labels,
-                                                           shape, self.feat_names.index(self.feat_type),
+                                                           state, self.feat_names.index(self.feat_type),
                                                            None)
 
-            return shape, labels, self.edges
+            return state.with_labels(labels), self.edges
 
         except:
-            return self.shape, self.labels, self.edges
+            return self.state, self.edges
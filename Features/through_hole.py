@@ -1,4 +1,3 @@
-import random
 import math
 import numpy as np
 
@@ -10,8 +9,8 @@ from Features.machining_features import MachiningFeature
 
 
 class ThroughHole(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 4
         self.bound_type = 4
         self.depth_type = "through"
@@ -32,7 +31,7 @@ class ThroughHole(MachiningFeature):
         center = (bound[0] + bound[1] + bound[2] + bound[3]) / 4
 
         if hetero:
-            scale = random.uniform(0.5, 1.5)
+            scale = self.rng.uniform(0.5, 1.5)
             circ = gp_Circ(gp_Ax2(gp_Pnt(center[0], center[1], center[2]), occ_utils.as_occ(normal, gp_Dir)), radius)
             edge1 = BRepBuilderAPI_MakeEdge(circ, 0., scale * math.pi).Edge()
             edge2 = BRepBuilderAPI_MakeEdge(circ, scale * math.pi, 2 * math.pi).Edge()
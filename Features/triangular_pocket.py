@@ -1,5 +1,4 @@
 import math
-import random
 import numpy as np
 import Utils.occ_utils as occ_utils
 
@@ -9,8 +8,8 @@ from Features.machining_features import MachiningFeature
 
 
 class TriangularPocket(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 4
         self.bound_type = 4
         self.depth_type = "blind"
@@ -32,15 +31,15 @@ class TriangularPocket(MachiningFeature):
 
         circ = Geom_Circle(gp_Ax2(gp_Pnt(center[0], center[1], center[2]), normal), radius)
 
-        ang1 = random.uniform(0.0, 2 * math.pi / 3)
+        ang1 = self.rng.uniform(0.0, 2 * math.pi / 3)
         pt1 = occ_utils.as_list(circ.Value(ang1))
 
-        ang2 = ang1 + random.uniform(2 * math.pi / 3 - math.pi / 9, 2 * math.pi / 3 + math.pi / 9)
+        ang2 = ang1 + self.rng.uniform(2 * math.pi / 3 - math.pi / 9, 2 * math.pi / 3 + math.pi / 9)
         if ang2 > 2 * math.pi:
             ang2 = ang2 - 2 * math.pi
         pt2 = occ_utils.as_list(circ.Value(ang2))
 
-        ang3 = ang2 + random.uniform(2 * math.pi / 3 - math.pi / 9, 2 * math.pi / 3 + math.pi / 9)
+        ang3 = ang2 + self.rng.uniform(2 * math.pi / 3 - math.pi / 9, 2 * math.pi / 3 + math.pi / 9)
         if ang3 > 2 * math.pi:
             ang3 = ang3 - 2 * math.pi
         pt3 = occ_utils.as_list(circ.Value(ang3))
@@ -48,10 +47,10 @@ class TriangularPocket(MachiningFeature):
         if hetero:
             # Split a face of the triangular passage
             original_list = [pt1, pt2, pt3]
-            selected_items = random.sample(original_list, 2)
+            selected_items = self.rng.sample(original_list, 2)
             unselected_items = [item for item in original_list if item not in selected_items]
             pnt1 = selected_items[0]
-            scale = random.uniform(0.1, 0.9)
+            scale = self.rng.uniform(0.1, 0.9)
             pnt2 = [scale * x + (1 - scale) * y for x, y in zip(selected_items[0], selected_items[1])]
             pnt3 = selected_items[1]
             pnt4 = unselected_items[0]
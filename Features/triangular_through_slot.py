@@ -1,4 +1,3 @@
-import random
 import numpy as np
 import Utils.occ_utils as occ_utils
 
@@ -6,8 +5,8 @@ from Features.machining_features import MachiningFeature
 
 
 class TriangularThroughSlot(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 1
         self.bound_type = 1
         self.depth_type = "through"
@@ -22,8 +21,8 @@ class TriangularThroughSlot(MachiningFeature):
         pnt3 = (bound[0] + bound[1] + bound[2] + bound[3]) / 4
 
         if hetero:
-            scale = random.uniform(0.1, 0.9)
-            selected_pt = random.choice([bound[1], bound[2]])
+            scale = self.rng.uniform(0.1, 0.9)
+            selected_pt = self.rng.choice([bound[1], bound[2]])
             pnt4 = np.array([scale * x + (1 - scale) * y for x, y in zip(selected_pt, pnt3)])
             if np.array_equal(selected_pt, bound[1]):
                 return occ_utils.face_polygon([bound[1], bound[2], pnt3, pnt4])
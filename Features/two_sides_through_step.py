@@ -1,4 +1,3 @@
-import random
 import numpy as np
 import Utils.occ_utils as occ_utils
 
@@ -6,8 +5,8 @@ from Features.machining_features import MachiningFeature
 
 
 class TwoSidesThroughStep(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 3
         self.bound_type = 3
         self.depth_type = "blind"
@@ -17,7 +16,7 @@ class TwoSidesThroughStep(MachiningFeature):
         dir_l = bound[0] - bound[1]
         dir_r = bound[3] - bound[2]
 
-        ratio = random.uniform(0.4, 0.8)
+        ratio = self.rng.uniform(0.4, 0.8)
         pt4 = (bound[0] + bound[3]) / 2
         pt0 = bound[1] + dir_l * ratio
         pt1 = bound[1]
@@ -25,8 +24,8 @@ class TwoSidesThroughStep(MachiningFeature):
         pt3 = bound[2] + dir_r * ratio
 
         if hetero:
-            scale = random.uniform(0.1, 0.9)
-            selected_pt = random.choice([pt0, pt3])
+            scale = self.rng.uniform(0.1, 0.9)
+            selected_pt = self.rng.choice([pt0, pt3])
             pt5 = np.array([scale * x + (1 - scale) * y for x, y in zip(selected_pt, pt4)])
             if np.array_equal(selected_pt, pt0):
                 return occ_utils.face_polygon([pt0, pt1, pt2, pt3, pt4, pt5])
@@ -1,4 +1,3 @@
-import random
 import math
 import numpy as np
 
@@ -11,8 +10,8 @@ from Features.machining_features import MachiningFeature
 
 
 class VCircularEndBlindSlot(MachiningFeature):
-    def __init__(self, shape, label_map, min_len, clearance, feat_names):
-        super().__init__(shape, label_map, min_len, clearance, feat_names)
+    def __init__(self, shape, label_map, min_len, clearance, feat_names, rng=None, stock_dims=None):
+        super().__init__(shape, label_map, min_len, clearance, feat_names, rng, stock_dims)
         self.shifter_type = 1
         self.bound_type = 1
         self.depth_type = "blind"
@@ -26,7 +25,7 @@ class VCircularEndBlindSlot(MachiningFeature):
         if height - width / 2 > 1.0:
             radius = width / 2
         else:
-            radius = random.uniform(0.5, height / 2)
+            radius = self.rng.uniform(0.5, height / 2)
 
         offset = width / 2 - radius
         dir_w = dir_w / width
@@ -43,7 +42,7 @@ class VCircularEndBlindSlot(MachiningFeature):
 
         if hetero:
             # A certain point of the semicircular arc
-            angle = random.uniform(-math.pi / 3, math.pi / 3)
+            angle = self.rng.uniform(-math.pi / 3, math.pi / 3)
             radius_dir = occ_utils.rotate_vector(dir_h, angle, occ_utils.as_occ(normal, gp_Dir))
             pt34 = occ_utils.as_occ(center + radius_dir * radius, gp_Pnt)
 
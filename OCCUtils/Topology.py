@@ -30,7 +30,8 @@ from OCC.Core.TopAbs import (TopAbs_VERTEX, TopAbs_EDGE, TopAbs_FACE, TopAbs_WIR
 from OCC.Core.TopExp import TopExp_Explorer, topexp_MapShapesAndAncestors
 from OCC.Core.TopTools import (TopTools_ListOfShape,
                           TopTools_ListIteratorOfListOfShape,
-                          TopTools_IndexedDataMapOfShapeListOfShape)
+                          TopTools_IndexedDataMapOfShapeListOfShape,
+                          TopTools_IndexedMapOfShape)
 from OCC.Core.TopoDS import (topods, TopoDS_Wire, TopoDS_Vertex, TopoDS_Edge,
                         TopoDS_Face, TopoDS_Shell, TopoDS_Solid,
                         TopoDS_Compound, TopoDS_CompSolid, topods_Edge,
@@ -56,8 +57,8 @@ class WireExplorer(object):
             self._reinitialize()
         topologyType = topods_Edge if edges else topods_Vertex
         seq = []
-        hashes = []  # list that stores hashes to avoid redundancy
-        occ_seq = TopTools_ListOfShape()
+        # shapes already seen, the map compares with IsSame like the hashes of TopoDS_Shape
+        seen = TopTools_IndexedMapOfShape()
         while self.wire_explorer.More():
             # loop edges
             if edges:
@@ -65,18 +66,11 @@ class WireExplorer(object):
             # loop vertices
             else:
                 current_item = self.wire_explorer.CurrentVertex()
-            current_item_hash = current_item.__hash__()
-            if not current_item_hash in hashes:
-                hashes.append(current_item_hash)
-                occ_seq.Append(current_item)
+            num_seen = seen.Extent()
+            if seen.Add(current_item) > num_seen:
+                seq.append(topologyType(current_item))
             self.wire_explorer.Next()
 
-        # Convert occ_seq to python list
-        occ_iterator = TopTools_ListIteratorOfListOfShape(occ_seq)
-        while occ_iterator.More():
-            topo_to_add = topologyType(occ_iterator.Value())
-            seq.append(topo_to_add)
-            occ_iterator.Next()
         self.done = True
         return iter(seq)
 
@@ -144,52 +138,38 @@ class Topo(object):
                      TopAbs_COMPSOLID: TopoDS_CompSolid}
 
         assert topologyType in topoTypes.keys(), '%s not one of %s' % (topologyType, topoTypes.keys())
-        self.topExp = TopExp_Explorer()
+        topExp = TopExp_Explorer()
         # use self.myShape if nothing is specified
         if topologicalEntity is None and topologyTypeToAvoid is None:
-            self.topExp.Init(self.myShape, topologyType)
+            topExp.Init(self.myShape, topologyType)
         elif topologicalEntity is None and topologyTypeToAvoid is not None:
-            self.topExp.Init(self.myShape, topologyType, topologyTypeToAvoid)
+            topExp.Init(self.myShape, topologyType, topologyTypeToAvoid)
         elif topologyTypeToAvoid is None:
-            self.topExp.Init(topologicalEntity, topologyType)
+            topExp.Init(topologicalEntity, topologyType)
         elif topologyTypeToAvoid:
-            self.topExp.Init(topologicalEntity,
-                             topologyType,
-                             topologyTypeToAvoid)
-        seq = []
-        hashes = []  # list that stores hashes to avoid redundancy
-        occ_seq = TopTools_ListOfShape()
-        while self.topExp.More():
-            current_item = self.topExp.Current()
-            current_item_hash = current_item.__hash__()
-
-            if not current_item_hash in hashes:
-                hashes.append(current_item_hash)
-                occ_seq.Append(current_item)
-
-            self.topExp.Next()
-        # Convert occ_seq to python list
-        occ_iterator = TopTools_ListIteratorOfListOfShape(occ_seq)
-        while occ_iterator.More():
-            topo_to_add = self.topoFactory[topologyType](occ_iterator.Value())
-            seq.append(topo_to_add)
-            occ_iterator.Next()
-
+            topExp.Init(topologicalEntity,
+                        topologyType,
+                        topologyTypeToAvoid)
+        self.topExp = topExp
+
+        # the map compares with IsSame, entities of the same TShape but another orientation are dropped as well,
+        # so ignore_orientation needs no further filtering
+        items = self._unique_items(topExp, self.topoFactory[topologyType])
         if self.ignore_orientation:
-            # filter out those entities that share the same TShape
-            # but do *not* share the same orientation
-            filter_orientation_seq = []
-            for i in seq:
-                _present = False
-                for j in filter_orientation_seq:
-                    if i.IsSame(j):
-                        _present = True
-                        break
-                if _present is False:
-                    filter_orientation_seq.append(i)
-            return filter_orientation_seq
+            return list(items)
         else:
-            return iter(seq)
+            return items
+
+    @staticmethod
+    def _unique_items(topExp, cast):
+        """Yields the shapes found by an explorer, each one only once, in linear time."""
+        seen = TopTools_IndexedMapOfShape()
+        while topExp.More():
+            current_item = topExp.Current()
+            num_seen = seen.Extent()
+            if seen.Add(current_item) > num_seen:
+                yield cast(current_item)
+            topExp.Next()
 
     def faces(self):
         '''
@@ -508,4 +488,31 @@ def shapeTypeString(shape):
         s = "Compound."
     if st == TopAbs_COMPSOLID:
         s = "Compsolid."
-    return "%s: %i" % (s, hash(shape))
\ No newline at end of file
+    return "%s: %i" % (s, hash(shape))
+
+
+if __name__ == '__main__':
+    # traversal of the edges of a compound of boxes against the explorer of pythonocc
+    import time
+    from OCC.Core.BRep import BRep_Builder
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+    from OCC.Core.gp import gp_Pnt
+    from OCC.Extend.TopologyUtils import TopologyExplorer
+
+    for num_boxes in [25, 100, 400]:
+        builder = BRep_Builder()
+        compound = TopoDS_Compound()
+        builder.MakeCompound(compound)
+        for i in range(num_boxes):
+            builder.Add(compound, BRepPrimAPI_MakeBox(gp_Pnt(2.0 * i, 0.0, 0.0), 1.0, 1.0, 1.0).Shape())
+
+        start = time.perf_counter()
+        old_edges = list(TopologyExplorer(compound).edges())
+        old_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new_edges = list(Topo(compound, ignore_orientation=True).edges())
+        new_time = time.perf_counter() - start
+
+        assert len(new_edges) == len(old_edges) and all(a.IsEqual(b) for a, b in zip(old_edges, new_edges))
+        print(f'{len(new_edges)} edges: TopologyExplorer {1000 * old_time:.1f} ms, Topo {1000 * new_time:.1f} ms')
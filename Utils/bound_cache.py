@@ -0,0 +1,108 @@
+"""
+Candidate bounds of the working shape, shared between consecutive features.
+
+The candidates of a face only depend on the face itself, they are kept until a feature modifies or deletes it.
+Whether a candidate can be machined depends on the rest of the shape along the rays cast from it, its result is
+evaluated again when a feature is cut in that region.
+"""
+
+import numpy as np
+
+
+def probe_region(pts, normal):
+    """Bounding box [lo, hi] of the half-infinite prism swept by a planar face along its normal.
+
+    The box is grown by the size of the face, the rectangles of _bound_inner may stick out of non-convex faces.
+    """
+    lo, hi = pts.min(axis=0), pts.max(axis=0)
+    margin = np.max(hi - lo)
+    region = np.array([lo - margin, hi + margin])
+    for k in range(3):
+        if normal[k] > 1e-9:
+            region[1][k] = np.inf
+        elif normal[k] < -1e-9:
+            region[0][k] = -np.inf
+
+    return region
+
+
+def feature_region(bound, depth_dir):
+    """Bounding box [lo, hi] of the prism swept by the sketch of a feature, with a margin for the faces it touches."""
+    pnts = np.concatenate([bound[:4], bound[:4] + depth_dir])
+
+    return np.array([pnts.min(axis=0) - 1e-3, pnts.max(axis=0) + 1e-3])
+
+
+class FaceBounds:
+    """Candidate bounds of one face and their evaluation results.
+
+    results[i] is None while candidate i is not evaluated, False if it was rejected and the bound otherwise.
+    """
+    def __init__(self, mesh, candidates, region):
+        self.mesh = mesh
+        self.candidates = candidates
+        self.results = [None] * len(candidates)
+        self.region = region
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def evaluate(self, idx, evaluate):
+        """Returns a copy of the bound of candidate idx, None if it is rejected.
+
+        :param evaluate: Function of a candidate returning its bound or None, given by the current feature, the
+                         candidates themselves are plain data.
+        """
+        if self.results[idx] is None:
+            bound = evaluate(self.candidates[idx])
+            self.results[idx] = False if bound is None else bound
+
+        if self.results[idx] is False:
+            return None
+
+        # the shifter of the feature modifies the bound in place
+        return self.results[idx].copy()
+
+    def reset(self):
+        self.results = [None] * len(self.candidates)
+
+
+class BoundCache:
+    """FaceBounds keyed by bound type and face.
+
+    An entry is only returned for the mesh it was built from, since the candidates sample the face triangulation.
+    """
+    def __init__(self):
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, bound_type, face, mesh):
+        entry = self._entries.get((bound_type, face))
+        if entry is None or entry.mesh is not mesh:
+            return None
+
+        return entry
+
+    def set(self, bound_type, face, entry):
+        self._entries[(bound_type, face)] = entry
+
+    def invalidate(self, faces, region):
+        """Drops the entries of the given faces, and resets the results of the entries probing the region.
+
+        :param faces: Faces modified or deleted by a feature.
+        :param region: Bounding box [lo, hi] of the feature, see feature_region.
+        """
+        faces = set(faces)
+        for key in list(self._entries.keys()):
+            if key[1] in faces:
+                del self._entries[key]
+                continue
+
+            entry = self._entries[key]
+            if np.all(entry.region[0] <= region[1]) and np.all(region[0] <= entry.region[1]):
+                entry.reset()
+
+    def clear(self):
+        self._entries.clear()
@@ -238,6 +238,30 @@ def search_rect_inside_bound_3(pnt1, pnt2, vec1, vec2, bnd_pnts):
     return verts
 
 
+def rect_candidate_pairs(heights, min_height):
+    """Pairs (i, j), i < j, of the samples along a context edge whose rectangle may reach min_height.
+
+    heights[k] is the height of the face boundary above sample k, as probed by MachiningFeature._bound_1. The
+    rectangle found by search_rect_inside_bound_1 between samples i and j is never higher than the face at sample i,
+    and a boundary point between the samples which is clearly below both sides lies inside of it and caps its height,
+    the pairs left out are those whose rectangle fails the height check anyway.
+    """
+    for i in range(len(heights) - 1):
+        if heights[i] < min_height - 1e-6:
+            continue
+        # lowest face boundary point between sample i and sample j
+        lowest = np.inf
+
+        for j in range(i + 1, len(heights)):
+            capped = lowest < min(min_height, heights[i], heights[j]) - 1e-3
+            if heights[j] > 1e-5:
+                lowest = min(lowest, heights[j])
+            if capped:
+                continue
+
+            yield i, j
+
+
 def points_inside_rect(pnt0, pnt1, pnt2, pnt3, resolution=0.5):
     pnt0 = np.array(pnt0)
     pnt1 = np.array(pnt1)
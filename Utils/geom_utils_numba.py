@@ -1,54 +1,61 @@
 import math
+import os
+import subprocess
+import sys
 import numpy as np
 import numba as nb
 import Utils.numba_vec as nbv
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def search_rect_inside_bound_1(verts, vec1, vec2, bnd_pnts):
     in_pnts = points_in_polygon(bnd_pnts, verts)
     if in_pnts.shape[0] == 0:
         return verts
 
     # find perpendicular unit vector of normal and line
-    normal = nbv.cross(vec2, verts[1] - verts[2])
-    line_dir = nbv.sub(verts[1], verts[2])
-    perp_dir = nbv.cross(normal, line_dir)
-    perp_dir = nbv.div(nbv.calc_l2_norm(perp_dir), perp_dir)
+    normal = nbv.cross3(vec2, nbv.sub3(verts[2], verts[1]))
+    line_dir = nbv.sub3(verts[1], verts[2])
+    perp_dir = nbv.cross3(normal, line_dir)
+    perp_dir = nbv.div3(nbv.norm3(perp_dir), perp_dir)
 
     # Projecting vec1 onto unit_perp_dir
-    norm1 = nbv.dot(vec1, perp_dir)
-    norm2 = nbv.dot(vec2, perp_dir)
-    dist = min([nbv.dot(pnt - verts[1], perp_dir) for pnt in in_pnts] + [norm1, norm2])
-    vec1 = nbv.div(norm1, nbv.mul(dist, vec1))
-    vec2 = nbv.div(norm2, nbv.mul(dist, vec2))
+    norm1 = nbv.dot3(vec1, perp_dir)
+    norm2 = nbv.dot3(vec2, perp_dir)
+    dist = min(norm1, norm2)
+    for i in range(in_pnts.shape[0]):
+        dist = min(dist, nbv.dot3(nbv.sub3(verts[1], in_pnts[i]), perp_dir))
 
-    verts[0] = nbv.add(verts[1], vec1)
-    verts[3] = nbv.add(verts[2], vec2)
+    nbv.store3(verts[0], nbv.add3(verts[1], nbv.div3(norm1, nbv.mul3(dist, vec1))))
+    nbv.store3(verts[3], nbv.add3(verts[2], nbv.div3(norm2, nbv.mul3(dist, vec2))))
 
     return verts
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def search_rect_inside_bound_2(verts, vec0, vec2, bnd_pnts):
     in_pnts = points_in_polygon(bnd_pnts, verts)
 
     if in_pnts.shape[0] == 0:
         return verts
 
-    vec0_len = nbv.calc_l2_norm(vec0)
-    vec0 = nbv.div(vec0_len, vec0)
-    vec2_len = nbv.calc_l2_norm(vec2)
-    vec2 = nbv.div(vec2_len, vec2)
-    len2 = min([nbv.dot(pnt - verts[1], vec2) for pnt in in_pnts] + [vec2_len])
-    len0 = min([nbv.dot(pnt - verts[1], vec0) for pnt in in_pnts] + [vec0_len])
+    vec0_len = nbv.norm3(vec0)
+    dir0 = nbv.div3(vec0_len, vec0)
+    vec2_len = nbv.norm3(vec2)
+    dir2 = nbv.div3(vec2_len, vec2)
+    len0 = vec0_len
+    len2 = vec2_len
+    for i in range(in_pnts.shape[0]):
+        pnt_dir = nbv.sub3(verts[1], in_pnts[i])
+        len2 = min(len2, nbv.dot3(pnt_dir, dir2))
+        len0 = min(len0, nbv.dot3(pnt_dir, dir0))
 
-    vec0 = nbv.mul(len0, vec0)
-    vec2 = nbv.mul(len2, vec2)
+    new_vec0 = nbv.mul3(len0, dir0)
+    new_vec2 = nbv.mul3(len2, dir2)
 
-    verts[0] = nbv.add(vec0, verts[1])
-    verts[2] = nbv.add(vec2, verts[1])
-    verts[3] = nbv.add(nbv.add(vec0, vec2), verts[1])
+    nbv.store3(verts[0], nbv.add3(new_vec0, verts[1]))
+    nbv.store3(verts[2], nbv.add3(new_vec2, verts[1]))
+    nbv.store3(verts[3], nbv.add3(nbv.add3(new_vec0, new_vec2), verts[1]))
 
     for vert in verts:
         assert not math.isnan(vert[0]), 'vert[0] is not a number'
@@ -58,35 +65,35 @@ def search_rect_inside_bound_2(verts, vec0, vec2, bnd_pnts):
     return verts
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def search_rect_inside_bound_3(verts, bnd_pnts):
-    vec1 = nbv.sub(verts[1], verts[0])
-    vec2 = nbv.sub(verts[2], verts[3])
+    vec1 = nbv.sub3(verts[1], verts[0])
+    vec2 = nbv.sub3(verts[2], verts[3])
 
     in_pnts = points_in_polygon(bnd_pnts, verts)
     if in_pnts.shape[0] == 0:
         return verts
 
     # Find perpendicular unit vector of normal and line
-    normal = nbv.cross(vec2, verts[1] - verts[2])
-    line_dir = nbv.sub(verts[1], verts[2])
-    perp_dir = nbv.cross(normal, line_dir)
-    perp_dir = nbv.div(nbv.calc_l2_norm(perp_dir), perp_dir)
+    normal = nbv.cross3(vec2, nbv.sub3(verts[2], verts[1]))
+    line_dir = nbv.sub3(verts[1], verts[2])
+    perp_dir = nbv.cross3(normal, line_dir)
+    perp_dir = nbv.div3(nbv.norm3(perp_dir), perp_dir)
 
     # Projecting vec1 onto unit_perp_dir
-    norm1 = nbv.dot(vec1, perp_dir)
-    norm2 = nbv.dot(vec2, perp_dir)
-    dist = min([nbv.dot(nbv.sub(verts[1], pnt), perp_dir) for pnt in in_pnts] + [norm1, norm2])
-    vec1 = nbv.div(norm1, nbv.mul(dist, vec1))
-    vec2 = nbv.div(norm2, nbv.mul(dist, vec2))
+    norm1 = nbv.dot3(vec1, perp_dir)
+    norm2 = nbv.dot3(vec2, perp_dir)
+    dist = min(norm1, norm2)
+    for i in range(in_pnts.shape[0]):
+        dist = min(dist, nbv.dot3(nbv.sub3(verts[1], in_pnts[i]), perp_dir))
 
-    verts[0] = nbv.add(verts[1], vec1)
-    verts[3] = nbv.add(verts[2], vec2)
+    nbv.store3(verts[0], nbv.add3(verts[1], nbv.div3(norm1, nbv.mul3(dist, vec1))))
+    nbv.store3(verts[3], nbv.add3(verts[2], nbv.div3(norm2, nbv.mul3(dist, vec2))))
 
     return verts
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def ray_triangle_set_intersect(ray_origin, ray_direction, tri_list):
     """
     input:
@@ -108,7 +115,234 @@ def ray_triangle_set_intersect(ray_origin, ray_direction, tri_list):
     return min(results)
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
+def triangle_bboxes(tri_list):
+    """
+    input:
+        tri_list: [[[float, float, float] * 3]] * n
+    output:
+        [[[xmin, ymin, zmin], [xmax, ymax, zmax]]] * n
+    """
+    bboxes = np.zeros(shape=(tri_list.shape[0], 2, 3))
+    for i in range(tri_list.shape[0]):
+        for k in range(3):
+            bboxes[i][0][k] = min(tri_list[i][0][k], tri_list[i][1][k], tri_list[i][2][k])
+            bboxes[i][1][k] = max(tri_list[i][0][k], tri_list[i][1][k], tri_list[i][2][k])
+
+    return bboxes
+
+
+@nb.njit(cache=True, fastmath=True)
+def build_bvh(prim_bboxes, leaf_size=4, pad=0.000001):
+    """Builds a bounding volume hierarchy over a set of primitives by median split on the widest centroid axis.
+
+    Nodes are stored flat, the children of an inner node are stored next to each other.
+
+    :param prim_bboxes: [[[xmin, ymin, zmin], [xmax, ymax, zmax]]] * n, bounding box of each primitive.
+    :param leaf_size: Maximum number of primitives in a leaf.
+    :param pad: Padding added to the node boxes so that primitives lying flat on a box face are not missed.
+    :return: node_bboxes [[[float] * 3] * 2] * m,
+             node_info [[left child, first primitive, number of primitives]] * m, left child is -1 for leaves,
+             order [int] * n, primitive indices referenced by the leaves.
+    """
+    num_prims = prim_bboxes.shape[0]
+    max_nodes = max(2 * num_prims - 1, 1)
+    node_bboxes = np.zeros(shape=(max_nodes, 2, 3))
+    node_info = np.zeros(shape=(max_nodes, 3), dtype=np.int64)
+    order = np.arange(num_prims)
+    centroids = np.zeros(shape=(num_prims, 3))
+    for i in range(num_prims):
+        for k in range(3):
+            centroids[i][k] = 0.5 * (prim_bboxes[i][0][k] + prim_bboxes[i][1][k])
+
+    node_info[0][0] = -1
+    node_info[0][2] = num_prims
+    num_nodes = 1
+    stack = np.zeros(max_nodes, dtype=np.int64)
+    top = 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        start = node_info[node][1]
+        count = node_info[node][2]
+
+        lo = np.full(3, 1e300)
+        hi = np.full(3, -1e300)
+        c_lo = np.full(3, 1e300)
+        c_hi = np.full(3, -1e300)
+        for i in range(start, start + count):
+            prim = order[i]
+            for k in range(3):
+                lo[k] = min(lo[k], prim_bboxes[prim][0][k])
+                hi[k] = max(hi[k], prim_bboxes[prim][1][k])
+                c_lo[k] = min(c_lo[k], centroids[prim][k])
+                c_hi[k] = max(c_hi[k], centroids[prim][k])
+
+        for k in range(3):
+            node_bboxes[node][0][k] = lo[k] - pad
+            node_bboxes[node][1][k] = hi[k] + pad
+
+        if count <= leaf_size:
+            continue
+
+        axis = 0
+        for k in range(1, 3):
+            if c_hi[k] - c_lo[k] > c_hi[axis] - c_lo[axis]:
+                axis = k
+        if c_hi[axis] - c_lo[axis] <= 0:
+            # all centroids coincide, no split can separate them
+            continue
+
+        prims = order[start:start + count].copy()
+        keys = np.zeros(count)
+        for i in range(count):
+            keys[i] = centroids[prims[i]][axis]
+        order[start:start + count] = prims[np.argsort(keys)]
+
+        half = count // 2
+        left = num_nodes
+        num_nodes += 2
+        node_info[node][0] = left
+        node_info[node][1] = 0
+        node_info[node][2] = 0
+        node_info[left][0] = -1
+        node_info[left][1] = start
+        node_info[left][2] = half
+        node_info[left + 1][0] = -1
+        node_info[left + 1][1] = start + half
+        node_info[left + 1][2] = count - half
+
+        stack[top] = left
+        stack[top + 1] = left + 1
+        top += 2
+
+    return node_bboxes[:num_nodes], node_info[:num_nodes], order
+
+
+@nb.njit(cache=True, fastmath=True)
+def ray_bbox_entry(ray_origin, ray_direction, bbox):
+    """Slab test of a ray against an axis aligned box.
+
+    :return: Distance along the ray at which it enters the box, 0 if the origin is inside, -1 if the ray misses.
+    """
+    t_enter = 0.0
+    t_exit = 1e300
+    for k in range(3):
+        if abs(ray_direction[k]) < 1e-12:
+            if ray_origin[k] < bbox[0][k] or ray_origin[k] > bbox[1][k]:
+                return -1.0
+            continue
+
+        inv_dir = 1.0 / ray_direction[k]
+        t0 = (bbox[0][k] - ray_origin[k]) * inv_dir
+        t1 = (bbox[1][k] - ray_origin[k]) * inv_dir
+        if t0 > t1:
+            t0, t1 = t1, t0
+        t_enter = max(t_enter, t0)
+        t_exit = min(t_exit, t1)
+        if t_enter > t_exit:
+            return -1.0
+
+    return t_enter
+
+
+@nb.njit(cache=True, fastmath=True)
+def ray_scene_intersect(ray_origin, ray_direction, tri_list, top_bboxes, top_info, top_order, face_roots,
+                        node_bboxes, node_info, node_order, any_hit):
+    """Casts one ray against a two level BVH, a top level over the faces and one BVH per face over its triangles.
+
+    :param ray_origin: [float, float, float]
+    :param ray_direction: [float, float, float]
+    :param tri_list: [[[float, float, float] * 3]] * n
+    :param top_bboxes, top_info, top_order: Top level BVH, its primitives are faces.
+    :param face_roots: Root node of the BVH of each face in node_bboxes and node_info.
+    :param node_bboxes, node_info, node_order: Concatenated BVHs of the faces, node_order indexes tri_list.
+    :param any_hit: Return the first positive hit found instead of the nearest one.
+    :return: Distance to the nearest hit, NINF if the ray hits nothing.
+    """
+    hit = False
+    nearest = 0.0
+    top_stack = np.zeros(64, dtype=np.int64)
+    stack = np.zeros(64, dtype=np.int64)
+    top_stack[0] = 0
+    num_top = 1
+    while num_top > 0:
+        num_top -= 1
+        top_node = top_stack[num_top]
+        t_enter = ray_bbox_entry(ray_origin, ray_direction, top_bboxes[top_node])
+        if t_enter < 0 or (hit and t_enter > nearest):
+            continue
+
+        if top_info[top_node][0] >= 0:
+            top_stack[num_top] = top_info[top_node][0]
+            top_stack[num_top + 1] = top_info[top_node][0] + 1
+            num_top += 2
+            continue
+
+        for i in range(top_info[top_node][1], top_info[top_node][1] + top_info[top_node][2]):
+            stack[0] = face_roots[top_order[i]]
+            num_nodes = 1
+            while num_nodes > 0:
+                num_nodes -= 1
+                node = stack[num_nodes]
+                t_enter = ray_bbox_entry(ray_origin, ray_direction, node_bboxes[node])
+                if t_enter < 0 or (hit and t_enter > nearest):
+                    continue
+
+                if node_info[node][0] >= 0:
+                    stack[num_nodes] = node_info[node][0]
+                    stack[num_nodes + 1] = node_info[node][0] + 1
+                    num_nodes += 2
+                    continue
+
+                for j in range(node_info[node][1], node_info[node][1] + node_info[node][2]):
+                    tri = tri_list[node_order[j]]
+                    dist = ray_triangle_intersect(ray_origin, ray_direction, tri[0], tri[1], tri[2])
+                    if dist > 0 and (not hit or dist < nearest):
+                        if any_hit:
+                            return dist
+                        hit = True
+                        nearest = dist
+
+    if hit:
+        return nearest
+
+    return np.NINF
+
+
+@nb.njit(cache=True, fastmath=True, parallel=True)
+def rays_scene_intersect(ray_origins, ray_direction, tri_list, top_bboxes, top_info, top_order, face_roots,
+                         node_bboxes, node_info, node_order):
+    """
+    Batched ray_scene_intersect, one thread per ray.
+    output:
+        [float] * m, distance to the nearest hit of each ray, NINF if the ray hits nothing
+    """
+    results = np.full(ray_origins.shape[0], np.NINF)
+    for i in nb.prange(ray_origins.shape[0]):
+        results[i] = ray_scene_intersect(ray_origins[i], ray_direction, tri_list, top_bboxes, top_info, top_order,
+                                         face_roots, node_bboxes, node_info, node_order, False)
+
+    return results
+
+
+@nb.njit(cache=True, fastmath=True)
+def rays_hit_scene(ray_origins, ray_direction, tri_list, top_bboxes, top_info, top_order, face_roots,
+                   node_bboxes, node_info, node_order):
+    """
+    Checks if any ray of a batch of parallel rays hits the scene, returns as soon as one does.
+    output:
+        bool
+    """
+    for i in range(ray_origins.shape[0]):
+        if ray_scene_intersect(ray_origins[i], ray_direction, tri_list, top_bboxes, top_info, top_order,
+                               face_roots, node_bboxes, node_info, node_order, True) > 0:
+            return True
+
+    return False
+
+
+@nb.njit(cache=True, fastmath=True)
 def ray_triangle_intersect(ray_origin, ray_direction, tri_v0, tri_v1, tri_v2):
     """
     https://www.scratchapixel.com/lessons/3d-basic-rendering/ray-tracing-rendering-a-triangle/moller-trumbore-ray-triangle-intersection
@@ -117,35 +351,35 @@ def ray_triangle_intersect(ray_origin, ray_direction, tri_v0, tri_v1, tri_v2):
     output:
         float
     """
-    v0v1 = nbv.sub(tri_v0, tri_v1)
-    v0v2 = nbv.sub(tri_v0, tri_v2)
-    pvec = nbv.cross(ray_direction, v0v2)
+    v0v1 = nbv.sub3(tri_v0, tri_v1)
+    v0v2 = nbv.sub3(tri_v0, tri_v2)
+    pvec = nbv.cross3(ray_direction, v0v2)
 
-    det = nbv.dot(v0v1, pvec)
+    det = nbv.dot3(v0v1, pvec)
 
     if abs(det) < 0.000001:
         return np.NINF
 
     invDet = 1.0 / det
 
-    tvec = nbv.sub(tri_v0, ray_origin)
-    u = nbv.dot(tvec, pvec) * invDet
+    tvec = nbv.sub3(tri_v0, ray_origin)
+    u = nbv.dot3(tvec, pvec) * invDet
 
     if u < 0 or u > 1:
         return np.NINF
 
-    qvec = nbv.cross(tvec, v0v1)
-    v = nbv.dot(ray_direction, qvec) * invDet
+    qvec = nbv.cross3(tvec, v0v1)
+    v = nbv.dot3(ray_direction, qvec) * invDet
 
     if v < 0 or u + v > 1:
         return np.NINF
 
-    t = nbv.dot(v0v2, qvec) * invDet
+    t = nbv.dot3(v0v2, qvec) * invDet
 
     return t
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def ray_segment_set_intersect(ray_pnt, ray_dir, segs):
     intersects = np.zeros(shape=(segs.shape[0]))
 
@@ -157,50 +391,50 @@ def ray_segment_set_intersect(ray_pnt, ray_dir, segs):
     return intersects
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def ray_segment_intersect(ray_pnt, ray_dir, pnt1, pnt2):
     thres = 0.000001
 
-    seg_dir = nbv.sub(pnt1, pnt2)
-    ray_dir = nbv.div(nbv.norm(ray_dir), ray_dir)
+    seg_dir = nbv.sub3(pnt1, pnt2)
+    ray_dir = nbv.div3(nbv.norm3(ray_dir), ray_dir)
 
     # check if ray origin lie on segment
-    vec1 = nbv.sub(ray_pnt, pnt1)
-    vec2 = nbv.sub(ray_pnt, pnt2)
+    vec1 = nbv.sub3(ray_pnt, pnt1)
+    vec2 = nbv.sub3(ray_pnt, pnt2)
 
-    origin_on_segment = nbv.norm(nbv.cross(vec1, vec2)) < thres
-    normal = nbv.cross(seg_dir, ray_dir)
+    origin_on_segment = nbv.norm3(nbv.cross3(vec1, vec2)) < thres
+    normal = nbv.cross3(seg_dir, ray_dir)
 
     if origin_on_segment:
-        if nbv.dot(vec1, vec2) < thres:
+        if nbv.dot3(vec1, vec2) < thres:
             return 0.0
         else:
-            if nbv.norm(normal) < thres:
-                dist1 = nbv.dot(vec1, ray_dir)
-                dist2 = nbv.dot(vec2, ray_dir)
+            if nbv.norm3(normal) < thres:
+                dist1 = nbv.dot3(vec1, ray_dir)
+                dist2 = nbv.dot3(vec2, ray_dir)
                 if dist1 > thres and dist2 > thres:
                     if dist1 < dist2:
-                        return nbv.norm(vec1)
+                        return nbv.norm3(vec1)
                     else:
-                        return nbv.norm(vec2)
+                        return nbv.norm3(vec2)
             else:
                 return np.NINF
 
     # check if ray and segment are parallel
-    if nbv.norm(normal) < thres:
+    if nbv.norm3(normal) < thres:
         return np.NINF
 
     # check if ray lie on one side of segment
-    if nbv.dot(vec1, ray_dir) < 0 and nbv.dot(vec2, ray_dir) < 0:
+    if nbv.dot3(vec1, ray_dir) < 0 and nbv.dot3(vec2, ray_dir) < 0:
         return np.NINF
 
     # check if segment lie on one side of ray
-    if nbv.dot(np.cross(vec1, ray_dir), nbv.cross(vec2, ray_dir)) > 0:
+    if nbv.dot3(nbv.cross3(vec1, ray_dir), nbv.cross3(vec2, ray_dir)) > 0:
         return np.NINF
 
-    seg_normal = nbv.cross(normal, seg_dir)
-    seg_normal = nbv.div(nbv.norm(seg_normal), seg_normal)
-    dist = nbv.dot(vec1, seg_normal) / nbv.dot(ray_dir, seg_normal)
+    seg_normal = nbv.cross3(normal, seg_dir)
+    seg_normal = nbv.div3(nbv.norm3(seg_normal), seg_normal)
+    dist = nbv.dot3(vec1, seg_normal) / nbv.dot3(ray_dir, seg_normal)
 
     try:
         assert not math.isnan(dist), 'dist is not a number'
@@ -209,47 +443,90 @@ def ray_segment_intersect(ray_pnt, ray_dir, pnt1, pnt2):
     return dist
 
 
-@nb.njit(fastmath=True)
-def points_in_polygon(bnd_pnts, verts, closed=True, normal=None):
-    num_v = verts.shape[0]
-    assert num_v > 1
+@nb.njit(cache=True, fastmath=True)
+def polygon_edge_perps(verts, normal, closed=True):
+    """Unit vector of each polygon edge pointing to the inner side of the edge, as used by dist_pnt_line.
 
-    if num_v == 2:
-        assert normal is not None
-
-    if num_v > 2:
-        vec1 = nbv.sub(verts[0], verts[1])
-        vec2 = nbv.sub(verts[1], verts[2])
-        normal = nbv.cross(vec1, vec2)
+    :param verts: [[float, float, float]] * n
+    :param normal: Normal of the polygon plane.
+    :param closed: The last vertex is joined to the first one.
+    :return: [[float, float, float]] * number of edges
+    """
+    num_edges = verts.shape[0] if closed else verts.shape[0] - 1
+    perps = np.empty((num_edges, 3))
+    for i in range(num_edges):
+        line_dir = nbv.sub3(verts[i], verts[(i + 1) % verts.shape[0]])
+        perp_dir = nbv.cross3(normal, line_dir)
+        nbv.store3(perps[i], nbv.div3(nbv.norm3(perp_dir), perp_dir))
 
-    if closed:
-        new_verts = np.zeros(shape=(verts.shape[0] + 1, verts.shape[1]), dtype=verts.dtype)
-        new_verts[:verts.shape[0]] = verts
-        new_verts[-1] = verts[0]
-        verts = new_verts
+    return perps
 
-    idx = np.array([point_in_polygon(pnt, verts, normal) for pnt in bnd_pnts])
-    in_pnts = bnd_pnts[idx]
 
-    return in_pnts
+@nb.njit(cache=True, fastmath=True)
+def points_in_polygon(bnd_pnts, verts, closed=True, normal=None):
+    """Points lying inside a polygon, same test as point_in_polygon for every point.
 
+    The edge half-planes are computed once for all points. For a closed polygon with at least three vertices the
+    inside region is contained in the bounding box of the polygon projected onto its plane, points outside of it
+    are rejected without testing the edges.
+    """
+    num_v = verts.shape[0]
+    assert num_v > 1
 
-@nb.njit(fastmath=True)
+    # the normal argument is only used by two vertex polygons
+    if normal is None:
+        assert num_v > 2
+        plane_normal = nbv.cross3(nbv.sub3(verts[0], verts[1]), nbv.sub3(verts[1], verts[2]))
+    elif num_v > 2:
+        plane_normal = nbv.cross3(nbv.sub3(verts[0], verts[1]), nbv.sub3(verts[1], verts[2]))
+    else:
+        plane_normal = nbv.vec3(normal)
+
+    perps = polygon_edge_perps(verts, plane_normal, closed)
+
+    normal_len = nbv.norm3(plane_normal)
+    use_bbox = closed and num_v > 2 and normal_len > 1e-12
+    unit_normal = nbv.div3(normal_len if use_bbox else 1.0, plane_normal)
+    bbox = np.empty((2, 3))
+    if use_bbox:
+        for i in range(num_v):
+            proj = nbv.sub3(nbv.mul3(nbv.dot3(verts[i], unit_normal), unit_normal), verts[i])
+            for k in range(3):
+                if i == 0 or proj[k] < bbox[0][k]:
+                    bbox[0][k] = proj[k]
+                if i == 0 or proj[k] > bbox[1][k]:
+                    bbox[1][k] = proj[k]
+
+    idx = np.zeros(bnd_pnts.shape[0], dtype=np.bool_)
+    for i in range(bnd_pnts.shape[0]):
+        pnt = bnd_pnts[i]
+        if use_bbox:
+            proj = nbv.sub3(nbv.mul3(nbv.dot3(pnt, unit_normal), unit_normal), pnt)
+            if (proj[0] < bbox[0][0] - 0.000001 or proj[0] > bbox[1][0] + 0.000001 or
+                    proj[1] < bbox[0][1] - 0.000001 or proj[1] > bbox[1][1] + 0.000001 or
+                    proj[2] < bbox[0][2] - 0.000001 or proj[2] > bbox[1][2] + 0.000001):
+                continue
+
+        inside = True
+        for j in range(perps.shape[0]):
+            if nbv.dot3(nbv.sub3(verts[j], pnt), perps[j]) <= 0.000001:
+                inside = False
+                break
+        idx[i] = inside
+
+    return bnd_pnts[idx]
+
+
+@nb.njit(cache=True, fastmath=True)
 def point_in_polygon(the_pnt, verts, normal=None):
-    dists = np.array([dist_pnt_line(the_pnt, verts[i], verts[i + 1], normal) for i in range(len(verts) - 1)])
-    summation = 0
+    for i in range(len(verts) - 1):
+        if dist_pnt_line(the_pnt, verts[i], verts[i + 1], normal) <= 0.000001:
+            return False
 
-    for dist in dists:
-        if dist <= 0.000001:
-            summation += 1
-
-    if summation > 0:
-        return False
-    else:
-        return True
+    return True
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def point_in_polygon_face_numba(face_pnts, query_pnt):
     """ Finds if a point lies within the bounds of a polygon.
 
@@ -269,12 +546,12 @@ def point_in_polygon_face_numba(face_pnts, query_pnt):
     :param normal:
     :return:
     """
-    u = nbv.sub(face_pnts[0], face_pnts[1])
-    v = nbv.sub(face_pnts[0], face_pnts[2])
-    normal = nbv.cross(u, v)
+    u = nbv.sub3(face_pnts[0], face_pnts[1])
+    v = nbv.sub3(face_pnts[0], face_pnts[2])
+    normal = nbv.cross3(u, v)
     D = -(normal[0] * face_pnts[0][0] + normal[1] * face_pnts[0][1] + normal[2] * face_pnts[0][2])
     dis = query_pnt[0] * normal[0] + query_pnt[1] * normal[1] + query_pnt[2] * normal[2] + D
-    distance = dis / nbv.calc_l2_norm(normal)
+    distance = dis / nbv.norm3(normal)
 
     if distance > 0:
         return False
@@ -282,7 +559,7 @@ def point_in_polygon_face_numba(face_pnts, query_pnt):
         return True
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def dist_pnt_line(query_pnt, pnt0, pnt1, normal):
     """Calculates the distance of a query point from a line.
 
@@ -293,15 +570,46 @@ def dist_pnt_line(query_pnt, pnt0, pnt1, normal):
     :param pnt1: Second point of line.
     :return: Distance of query point from line.
     """
-    query_dir = nbv.sub(pnt0, query_pnt)
-    line_dir = nbv.sub(pnt0, pnt1)
-    perp_dir = nbv.cross(normal, line_dir)
-    perp_dir = nbv.div(nbv.calc_l2_norm(perp_dir), perp_dir)
+    query_dir = nbv.sub3(pnt0, query_pnt)
+    line_dir = nbv.sub3(pnt0, pnt1)
+    perp_dir = nbv.cross3(normal, line_dir)
+    perp_dir = nbv.div3(nbv.norm3(perp_dir), perp_dir)
 
-    return nbv.dot(query_dir, perp_dir)
+    return nbv.dot3(query_dir, perp_dir)
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True, parallel=True)
+def points_to_segments_dist(pnts, segs):
+    """Distance of each point to the nearest of a set of segments, one thread per point.
+    input:
+        pnts: [[float, float, float]] * n
+        segs: [[[float, float, float] * 2]] * m, m > 0
+    output:
+        [float] * n, distance to the nearest segment
+        [[float, float, float]] * n, nearest point on the segments
+    """
+    dists = np.zeros(pnts.shape[0])
+    nearest = np.zeros((pnts.shape[0], 3))
+    for i in nb.prange(pnts.shape[0]):
+        best = -1.0
+        for j in range(segs.shape[0]):
+            seg_dir = nbv.sub3(segs[j][0], segs[j][1])
+            seg_len2 = nbv.dot3(seg_dir, seg_dir)
+            t = 0.0
+            if seg_len2 > 0.0:
+                t = min(max(nbv.dot3(nbv.sub3(segs[j][0], pnts[i]), seg_dir) / seg_len2, 0.0), 1.0)
+            foot = nbv.add3(segs[j][0], nbv.mul3(t, seg_dir))
+            diff = nbv.sub3(foot, pnts[i])
+            dist2 = nbv.dot3(diff, diff)
+            if best < 0.0 or dist2 < best:
+                best = dist2
+                nbv.store3(nearest[i], foot)
+        dists[i] = math.sqrt(best)
+
+    return dists, nearest
+
+
+@nb.njit(cache=True, fastmath=True)
 def dist_pnt_from_line_numba(query_pnt, pnt0, pnt1):
     """Calculates the distance of a query point from a line.
 
@@ -312,29 +620,75 @@ def dist_pnt_from_line_numba(query_pnt, pnt0, pnt1):
     :param pnt1: Second point of line.
     :return: Distance of query point from line.
     """
-    query_dir = query_pnt - pnt0
-    line_dir = pnt1 - pnt0
-    cross_product = nbv.cross(query_dir, line_dir)
-    A = nbv.calc_l2_norm(cross_product)
-    line_norm = nbv.calc_l2_norm(line_dir)
+    query_dir = nbv.sub3(pnt0, query_pnt)
+    line_dir = nbv.sub3(pnt0, pnt1)
+    cross_product = nbv.cross3(query_dir, line_dir)
+    A = nbv.norm3(cross_product)
+    line_norm = nbv.norm3(line_dir)
 
     result = A / line_norm
 
     return result
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def dist_point_plane_numba(pnt, pl_pnt, pl_normal):
-    p_dir = nbv.sub(pl_pnt, pnt)
-    dist = nbv.dot(p_dir, pl_normal)
+    p_dir = nbv.sub3(pl_pnt, pnt)
+    dist = nbv.dot3(p_dir, pl_normal)
 
     return dist
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def outer_radius_triangle(pt1, pt2, pt3):
-    a = nbv.calc_l2_norm(nbv.sub(pt2, pt1))
-    b = nbv.calc_l2_norm(nbv.sub(pt3, pt2))
-    c = nbv.calc_l2_norm(nbv.sub(pt1, pt3))
+    a = nbv.norm3(nbv.sub3(pt2, pt1))
+    b = nbv.norm3(nbv.sub3(pt3, pt2))
+    c = nbv.norm3(nbv.sub3(pt1, pt3))
     p = (a + b + c) / 2
     return a * b * c / (4 * math.sqrt(p * (p - a) * (p - b) * (p - c)))
+
+
+def warmup():
+    """Compiles the kernels used by the feature generation on tiny inputs, so that the JIT cost is paid before the
+    first shape. The kernels are cached on disk (cache=True), only the first run after a change compiles them, later
+    processes load the machine code from __pycache__. Numba only checks the timestamp of the file defining a
+    kernel, delete Utils/__pycache__/*.nbi and *.nbc after changing numba_vec.py.
+    """
+    verts = np.array([[0.0, 1.0, 0.0], [0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0]])
+    pnts = np.array([[0.5, 0.5, 0.0], [2.0, 2.0, 0.0]])
+    normal = np.array([0.0, 0.0, 1.0])
+
+    search_rect_inside_bound_1(verts.copy(), verts[0] - verts[1], verts[3] - verts[2], pnts)
+    search_rect_inside_bound_2(verts.copy(), verts[0] - verts[1], verts[2] - verts[1], pnts)
+    search_rect_inside_bound_3(verts.copy(), pnts)
+    point_in_polygon(pnts[0], np.array([verts[1], verts[2]]), normal=normal)
+    outer_radius_triangle(verts[0], verts[1], verts[2])
+    ray_segment_set_intersect(pnts[0], np.array([1.0, 0.0, 0.0]), np.array([[verts[2], verts[3]]]))
+    points_to_segments_dist(pnts, np.array([[verts[0], verts[1]], [verts[1], verts[2]]]))
+
+    tri_list = np.array([verts[:3]])
+    node_bboxes, node_info, node_order = build_bvh(triangle_bboxes(tri_list))
+    top_bboxes, top_info, top_order = build_bvh(node_bboxes[:1].copy(), 2)
+    face_roots = np.zeros(1, dtype=np.int64)
+    ray_origins = np.array([[0.2, 0.2, 1.0]])
+    scene = (tri_list, top_bboxes, top_info, top_order, face_roots, node_bboxes, node_info, node_order)
+    rays_scene_intersect(ray_origins, -normal, *scene)
+    rays_hit_scene(ray_origins, -normal, *scene)
+
+
+
+def fill_cache():
+    """Runs warmup() in a throwaway process to fill the on-disk cache. The parallel kernels start numba's threading
+    layer in the process calling them, which must not happen in a process that forks workers afterwards.
+    """
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-m', 'Utils.geom_utils_numba'], cwd=repo_dir, check=True)
+
+
+if __name__ == '__main__':
+    # fills the on-disk cache, e.g. once before a dataset build
+    import time
+
+    start = time.perf_counter()
+    warmup()
+    print(f'warmup: {time.perf_counter() - start:.2f} s')
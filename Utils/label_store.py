@@ -0,0 +1,205 @@
+"""
+Sharded binary store of the dataset labels.
+
+Labels of many samples are appended into fixed-size shards, each shard is a directory of .npy columns which the
+reader memory-maps, so that the labels of one sample are read without parsing any text:
+    seg.npy, bottom.npy:       per face labels of all samples of the shard, concatenated
+    inst_row.npy, inst_col.npy: upper triangle entries of the relation matrices, in local face ids
+    face_offsets.npy, inst_offsets.npy: start of each sample in the columns above
+index.json maps each shape name to its shard and row.
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+
+import Utils.labels as labels
+
+INDEX_FILE = 'index.json'
+
+
+def _write_json_atomic(pathname, data):
+    tmp_pathname = pathname + '.tmp'
+    with open(tmp_pathname, 'w', encoding='utf8') as fp:
+        json.dump(data, fp)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_pathname, pathname)
+
+
+def _save_column(shard_dir, column, array):
+    """Writes a column of a shard and syncs it to disk, so that the index never refers to a partly written shard."""
+    with open(os.path.join(shard_dir, column + '.npy'), 'wb') as fp:
+        np.save(fp, array)
+        fp.flush()
+        os.fsync(fp.fileno())
+
+
+def _per_face_array(face_label, dtype):
+    """{face id: label} as written by feature_creation.get_segmentation_label to an array."""
+    result = np.zeros(len(face_label), dtype=dtype)
+    for face_idx, label in face_label.items():
+        result[int(face_idx)] = label
+
+    return result
+
+
+def _instance_pairs(inst_label, inst_format):
+    """Upper triangle (row, col) entries of an encoded instance label."""
+    if inst_format == 'coo':
+        return np.asarray(inst_label['row'], dtype=np.int32), np.asarray(inst_label['col'], dtype=np.int32)
+
+    relation_matrix = labels.decode_instance_label(inst_label, inst_format)
+    rows, cols = np.nonzero(np.triu(relation_matrix))
+
+    return rows.astype(np.int32), cols.astype(np.int32)
+
+
+class LabelShardWriter:
+    """Appends the labels of generated samples to a sharded store.
+
+    Only one process may write to a store, the index is rewritten atomically every time a shard is completed.
+    """
+    def __init__(self, store_dir, shard_size=1000):
+        self.store_dir = store_dir
+        self.shard_size = shard_size
+        os.makedirs(store_dir, exist_ok=True)
+
+        index_path = os.path.join(store_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as fp:
+                self.index = json.load(fp)
+        else:
+            self.index = {'shards': [], 'samples': {}}
+        self._reset_buffer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _reset_buffer(self):
+        self._names = []
+        self._seg = []
+        self._bottom = []
+        self._inst_row = []
+        self._inst_col = []
+
+    def append(self, shape_name, seg_label, inst_label, bottom_label, inst_format='matrix'):
+        """Adds the labels of one sample, as passed to main.save_label."""
+        inst_row, inst_col = _instance_pairs(inst_label, inst_format)
+        self._names.append(shape_name)
+        self._seg.append(_per_face_array(seg_label, np.int32))
+        self._bottom.append(_per_face_array(bottom_label, np.uint8))
+        self._inst_row.append(inst_row)
+        self._inst_col.append(inst_col)
+
+        if len(self._names) >= self.shard_size:
+            self.flush()
+
+    def reset(self):
+        """Drops all samples of the store, e.g. when a new plan replaces the one the store was written for."""
+        self._reset_buffer()
+        self.index = {'shards': [], 'samples': {}}
+        # the empty index goes first, so that a reader never sees an index which refers to removed shards
+        _write_json_atomic(os.path.join(self.store_dir, INDEX_FILE), self.index)
+        for entry in os.listdir(self.store_dir):
+            if entry.startswith('shard_'):
+                shutil.rmtree(os.path.join(self.store_dir, entry))
+
+    def flush(self):
+        """Writes the buffered samples as a new shard."""
+        if len(self._names) == 0:
+            return
+
+        shard_name = 'shard_%05d' % len(self.index['shards'])
+        shard_dir = os.path.join(self.store_dir, shard_name)
+        os.makedirs(shard_dir, exist_ok=True)
+
+        face_offsets = np.cumsum([0] + [seg.shape[0] for seg in self._seg], dtype=np.int64)
+        inst_offsets = np.cumsum([0] + [row.shape[0] for row in self._inst_row], dtype=np.int64)
+        _save_column(shard_dir, 'seg', np.concatenate(self._seg))
+        _save_column(shard_dir, 'bottom', np.concatenate(self._bottom))
+        _save_column(shard_dir, 'inst_row', np.concatenate(self._inst_row))
+        _save_column(shard_dir, 'inst_col', np.concatenate(self._inst_col))
+        _save_column(shard_dir, 'face_offsets', face_offsets)
+        _save_column(shard_dir, 'inst_offsets', inst_offsets)
+
+        shard_idx = len(self.index['shards'])
+        self.index['shards'].append(shard_name)
+        for row, shape_name in enumerate(self._names):
+            self.index['samples'][shape_name] = [shard_idx, row]
+        _write_json_atomic(os.path.join(self.store_dir, INDEX_FILE), self.index)
+
+        self._reset_buffer()
+
+    def close(self):
+        self.flush()
+
+
+class LabelShardReader:
+    """Memory-mapped access to a store written by LabelShardWriter."""
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, INDEX_FILE), 'r') as fp:
+            self.index = json.load(fp)
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.index['samples'])
+
+    def __contains__(self, shape_name):
+        return shape_name in self.index['samples']
+
+    def names(self):
+        return list(self.index['samples'].keys())
+
+    def _shard(self, shard_idx):
+        shard = self._shards.get(shard_idx)
+        if shard is None:
+            shard_dir = os.path.join(self.store_dir, self.index['shards'][shard_idx])
+            shard = {}
+            for column in ['seg', 'bottom', 'inst_row', 'inst_col', 'face_offsets', 'inst_offsets']:
+                shard[column] = np.load(os.path.join(shard_dir, column + '.npy'), mmap_mode='r')
+            self._shards[shard_idx] = shard
+
+        return shard
+
+    def get(self, shape_name):
+        """Returns {'seg', 'bottom', 'inst_row', 'inst_col'} arrays of a sample."""
+        shard_idx, row = self.index['samples'][shape_name]
+        shard = self._shard(shard_idx)
+        face_start, face_end = shard['face_offsets'][row], shard['face_offsets'][row + 1]
+        inst_start, inst_end = shard['inst_offsets'][row], shard['inst_offsets'][row + 1]
+
+        return {'seg': shard['seg'][face_start:face_end],
+                'bottom': shard['bottom'][face_start:face_end],
+                'inst_row': shard['inst_row'][inst_start:inst_end],
+                'inst_col': shard['inst_col'][inst_start:inst_end]}
+
+    def __getitem__(self, shape_name):
+        return self.get(shape_name)
+
+    def relation_matrix(self, shape_name):
+        """Expands the instance label of a sample to the dense relation matrix."""
+        sample = self.get(shape_name)
+        inst_label = {'num_faces': sample['seg'].shape[0],
+                      'row': np.asarray(sample['inst_row']), 'col': np.asarray(sample['inst_col'])}
+
+        return labels.decode_instance_label(inst_label, 'coo')
+
+
+if __name__ == '__main__':
+    # convert the per sample json labels of a dataset into a sharded store
+    import sys
+    import pathlib
+
+    dataset_dir = sys.argv[1] if len(sys.argv) > 1 else 'HeteroMF'
+    label_files = sorted(pathlib.Path(dataset_dir, 'labels').glob('*.json'))
+    with LabelShardWriter(os.path.join(dataset_dir, 'label_shards')) as writer:
+        for label_file in label_files:
+            name, label = labels.load_label(label_file)
+            writer.append(name, label['seg'], label['inst'], label['bottom'], label['inst_format'])
+    print(f'Converted {len(label_files)} label files')
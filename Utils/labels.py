@@ -0,0 +1,104 @@
+"""
+Encoding of the instance labels saved next to each STEP file.
+
+'matrix' is the dense faces x faces relation matrix, 'coo' keeps only the upper triangle entries of the relation
+matrix and 'ids' stores the instance id of each face (-1 for faces which belong to no instance).
+"""
+
+import json
+import numpy as np
+
+INST_FORMATS = ['matrix', 'coo', 'ids']
+
+
+def encode_instance_label(inst_groups, num_faces, inst_format='matrix'):
+    """Encodes feature instances given as lists of face ids.
+
+    :param inst_groups: [[int]], face ids of each feature instance.
+    :param num_faces: Number of faces of the shape.
+    :param inst_format: One of INST_FORMATS.
+    :return: JSON serialisable instance label, None for 'ids' if a face belongs to several instances, which that
+             format cannot represent.
+    """
+    if inst_format == 'matrix':
+        relation_matrix = np.zeros((num_faces, num_faces), dtype=np.uint8)
+        for group in inst_groups:
+            # In the face_idx row，all instance faces are labeled as 1
+            relation_matrix[np.ix_(group, group)] = 1
+
+        assert relation_matrix.nonzero(), 'relation_matrix is empty'
+        assert np.allclose(relation_matrix, relation_matrix.T), 'relation_matrix is not symmetric'
+
+        return relation_matrix.tolist()
+
+    elif inst_format == 'coo':
+        pairs = set()
+        for group in inst_groups:
+            for row in group:
+                for col in group:
+                    if row <= col:
+                        pairs.add((row, col))
+        pairs = sorted(pairs)
+
+        return {'num_faces': num_faces, 'row': [pair[0] for pair in pairs], 'col': [pair[1] for pair in pairs]}
+
+    elif inst_format == 'ids':
+        inst_ids = [-1] * num_faces
+        for inst_id, group in enumerate(inst_groups):
+            for face_idx in group:
+                if inst_ids[face_idx] not in (-1, inst_id):
+                    return None
+                inst_ids[face_idx] = inst_id
+
+        return inst_ids
+
+    else:
+        assert False, 'Invalid instance label format: %s' % inst_format
+
+
+def decode_instance_label(inst_label, inst_format='matrix'):
+    """Expands an encoded instance label back to the dense relation matrix.
+
+    :param inst_label: Instance label as written by encode_instance_label.
+    :param inst_format: One of INST_FORMATS.
+    :return: (num_faces, num_faces) np.uint8 relation matrix.
+    """
+    if inst_format == 'matrix':
+        return np.asarray(inst_label, dtype=np.uint8)
+
+    elif inst_format == 'coo':
+        num_faces = inst_label['num_faces']
+        relation_matrix = np.zeros((num_faces, num_faces), dtype=np.uint8)
+        relation_matrix[inst_label['row'], inst_label['col']] = 1
+        relation_matrix[inst_label['col'], inst_label['row']] = 1
+
+        return relation_matrix
+
+    elif inst_format == 'ids':
+        inst_ids = np.asarray(inst_label, dtype=np.int64)
+        relation_matrix = (inst_ids[:, None] == inst_ids[None, :]) & (inst_ids[:, None] >= 0)
+
+        return relation_matrix.astype(np.uint8)
+
+    else:
+        assert False, 'Invalid instance label format: %s' % inst_format
+
+
+def instance_label_size(inst_label, inst_format='matrix'):
+    """Number of faces described by an encoded instance label."""
+    if inst_format == 'coo':
+        return inst_label['num_faces']
+
+    return len(inst_label)
+
+
+def load_label(pathname):
+    """Reads a label file written by main.save_label.
+
+    :return: shape name, {'seg', 'inst', 'bottom', 'inst_format'}, the instance label is left encoded.
+    """
+    with open(pathname, 'r') as fp:
+        shape_name, label = json.load(fp)[0]
+    label.setdefault('inst_format', 'matrix')
+
+    return shape_name, label
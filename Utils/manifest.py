@@ -0,0 +1,92 @@
+"""
+Generation manifest of a dataset.
+
+manifest.json holds the plan, one entry {'name', 'subset', 'combo', 'seed'} per sample, and is only written once
+per run. manifest_status.jsonl is an append-only log with one {'name', 'status'} line per finished sample, so that
+an interrupted run can be resumed without redoing the samples which are already done.
+"""
+
+import os
+import json
+
+MANIFEST_FILE = 'manifest.json'
+STATUS_FILE = 'manifest_status.jsonl'
+
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def write_plan(dataset_dir, samples):
+    """Writes the planned samples, the previous plan is replaced atomically and its status log is cleared.
+
+    :param dataset_dir: Dataset directory.
+    :param samples: [{'name', 'subset', 'combo', 'seed'}]
+    :return: None
+    """
+    pathname = os.path.join(dataset_dir, MANIFEST_FILE)
+    tmp_pathname = pathname + '.tmp'
+    with open(tmp_pathname, 'w', encoding='utf8') as fp:
+        json.dump({'samples': samples}, fp)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_pathname, pathname)
+
+    status_pathname = os.path.join(dataset_dir, STATUS_FILE)
+    if os.path.exists(status_pathname):
+        os.remove(status_pathname)
+
+
+def load_plan(dataset_dir):
+    """Returns the planned samples, None if the dataset has no manifest."""
+    pathname = os.path.join(dataset_dir, MANIFEST_FILE)
+    if not os.path.exists(pathname):
+        return None
+
+    with open(pathname, 'r') as fp:
+        return json.load(fp)['samples']
+
+
+def load_status(dataset_dir):
+    """Returns {name: status} of the finished samples, the last record of a sample wins.
+
+    A line truncated by an interruption is ignored.
+    """
+    pathname = os.path.join(dataset_dir, STATUS_FILE)
+    status = {}
+    if not os.path.exists(pathname):
+        return status
+
+    with open(pathname, 'r') as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            status[record['name']] = record['status']
+
+    return status
+
+
+class StatusLog:
+    """Appends the status of finished samples to the status log of a dataset."""
+    def __init__(self, dataset_dir):
+        self.fp = open(os.path.join(dataset_dir, STATUS_FILE), 'a+', encoding='utf8')
+        # terminate a line truncated by an interruption, so that it does not corrupt the next record
+        if self.fp.tell() > 0:
+            self.fp.seek(self.fp.tell() - 1)
+            if self.fp.read(1) != '\n':
+                self.fp.write('\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, name, status):
+        self.fp.write(json.dumps({'name': name, 'status': status}) + '\n')
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+
+    def close(self):
+        self.fp.close()
@@ -1,5 +1,9 @@
 """
 Vector linear algebra operations for numba accelerated code..
+
+add, sub, mul, div and cross return a new array and are meant for the python callers. The kernels of
+geom_utils_numba use the *3 variants instead, which take arrays or 3-tuples, return 3-tuples and are inlined, so
+that the intermediate vectors stay in registers instead of allocating an array per call.
 """
 
 import numba as nb
@@ -7,7 +11,7 @@ import math
 import numpy as np
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def add(vec1, vec2):
     result = np.zeros(3)
     result[0] = vec1[0] + vec2[0]
@@ -17,7 +21,7 @@ def add(vec1, vec2):
     return result
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def sub(vec1, vec2):
     result = np.zeros(3)
     result[0] = vec2[0] - vec1[0]
@@ -27,7 +31,7 @@ def sub(vec1, vec2):
     return result
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def mul(a, vec):
     """ Calculate the product of a scalar and a 3d vector and store the result in the second parameter."""
     result = np.zeros(3)
@@ -38,7 +42,7 @@ def mul(a, vec):
     return result
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def div(a, vec):
     """ Divide a 3d vector by a scalar and store the result in the third parameter. """
     result = np.zeros(3)
@@ -49,16 +53,16 @@ def div(a, vec):
     return result
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def sum(vec):
     result = 0
     for i in range(vec.shape[0]):
         result += vec[i]
 
-    return sum
+    return result
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def cross(vec1, vec2):
     """ Calculate the cross product of two 3d vectors. """
     result = np.zeros(3)
@@ -71,21 +75,116 @@ def cross(vec1, vec2):
     return result
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def dot(vec1, vec2):
     """ Calculate the dot product of two 3d vectors. """
     return vec1[0] * vec2[0] + vec1[1] * vec2[1] + vec1[2] * vec2[2]
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def norm(vec):
     """ Calculate the norm of a 3d vector. """
     return math.sqrt(vec[0] * vec[0] + vec[1] * vec[1] + vec[2] * vec[2])
 
 
-@nb.njit(fastmath=True)
+@nb.njit(cache=True, fastmath=True)
 def calc_l2_norm(v):
     s = 0
     for i in range(v.shape[0]):
         s += v[i] ** 2
     return math.sqrt(s)
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def vec3(vec):
+    return vec[0], vec[1], vec[2]
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def add3(vec1, vec2):
+    return vec1[0] + vec2[0], vec1[1] + vec2[1], vec1[2] + vec2[2]
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def sub3(vec1, vec2):
+    """ vec2 - vec1, same argument order as sub. """
+    return vec2[0] - vec1[0], vec2[1] - vec1[1], vec2[2] - vec1[2]
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def mul3(a, vec):
+    return a * vec[0], a * vec[1], a * vec[2]
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def div3(a, vec):
+    """ vec / a, same argument order as div. """
+    return vec[0] / a, vec[1] / a, vec[2] / a
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def cross3(vec1, vec2):
+    a1, a2, a3 = nb.double(vec1[0]), nb.double(vec1[1]), nb.double(vec1[2])
+    b1, b2, b3 = nb.double(vec2[0]), nb.double(vec2[1]), nb.double(vec2[2])
+
+    return a2 * b3 - a3 * b2, a3 * b1 - a1 * b3, a1 * b2 - a2 * b1
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def dot3(vec1, vec2):
+    return vec1[0] * vec2[0] + vec1[1] * vec2[1] + vec1[2] * vec2[2]
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def norm3(vec):
+    return math.sqrt(vec[0] * vec[0] + vec[1] * vec[1] + vec[2] * vec[2])
+
+
+@nb.njit(cache=True, fastmath=True, inline='always')
+def store3(out, vec):
+    """ Writes a 3-tuple into an existing array row. """
+    out[0] = vec[0]
+    out[1] = vec[1]
+    out[2] = vec[2]
+
+
+if __name__ == '__main__':
+    # micro-benchmark of the array and the tuple API on the vector chain of a ray-triangle test
+    import time
+    from numba.core.runtime import rtsys, _nrt_python
+
+    @nb.njit(fastmath=True)
+    def chain_array(pnts, direction):
+        total = 0.0
+        for i in range(pnts.shape[0] - 2):
+            edge1 = sub(pnts[i], pnts[i + 1])
+            edge2 = sub(pnts[i], pnts[i + 2])
+            pvec = cross(direction, edge2)
+            total += dot(edge1, pvec) + norm(div(2.0, add(edge1, mul(0.5, edge2))))
+
+        return total
+
+    @nb.njit(fastmath=True)
+    def chain_tuple(pnts, direction):
+        total = 0.0
+        for i in range(pnts.shape[0] - 2):
+            edge1 = sub3(pnts[i], pnts[i + 1])
+            edge2 = sub3(pnts[i], pnts[i + 2])
+            pvec = cross3(direction, edge2)
+            total += dot3(edge1, pvec) + norm3(div3(2.0, add3(edge1, mul3(0.5, edge2))))
+
+        return total
+
+    num_pnts = 1000000
+    pnts = np.random.default_rng(0).normal(size=(num_pnts, 3))
+    direction = np.array([0.0, 0.0, 1.0])
+    _nrt_python.memsys_enable_stats()
+    for name, func in [('array', chain_array), ('tuple', chain_tuple)]:
+        func(pnts[:3], direction)
+        allocs = rtsys.get_allocation_stats().alloc
+        start = time.perf_counter()
+        result = func(pnts, direction)
+        duration = time.perf_counter() - start
+        allocs = rtsys.get_allocation_stats().alloc - allocs
+        print(f'{name}: {duration * 1e3:8.2f} ms, {allocs / (num_pnts - 2):.1f} allocations per iteration, '
+              f'result {result:.6f}')
@@ -0,0 +1,109 @@
+"""
+Threads OCC may use inside one sample.
+
+BRepMesh_IncrementalMesh and the boolean operations behind BRepFeat_MakePrism (BOPAlgo) can spread their work over
+the OCC thread pool, which by default has a thread per core. With one generator process per core that oversubscribes
+the machine, with fewer processes (memory bound) the spare cores are left idle. configure() sets the mode of the
+calling process, main.py calls it in each worker, the __main__ block below measures the best split of a core count
+between processes and OCC threads.
+The fillets and chamfers (ChFi3d) have no parallel mode.
+"""
+
+from OCC.Core.BOPAlgo import BOPAlgo_Options
+from OCC.Core.OSD import OSD_ThreadPool
+
+# 0 keeps the OCC defaults: parallel meshing on all cores, sequential boolean operations
+_num_threads = 0
+
+
+def configure(num_threads):
+    """Sets the threads OCC may use in this process.
+
+    :param num_threads: 0 keeps the OCC defaults, 1 runs meshing and boolean operations sequentially, more runs both
+                        in parallel on a pool of that many threads.
+    """
+    global _num_threads
+    assert num_threads >= 0, 'negative number of OCC threads'
+    _num_threads = num_threads
+    if num_threads == 0:
+        return
+
+    # taken by the BOPAlgo algorithms created afterwards
+    BOPAlgo_Options.SetParallelMode(num_threads > 1)
+    if num_threads > 1:
+        pool = OSD_ThreadPool.DefaultPool(num_threads)
+        if pool.NbThreads() != num_threads:
+            pool.Init(num_threads)
+
+
+def num_threads():
+    return _num_threads
+
+
+def mesh_in_parallel():
+    """isInParallel flag of BRepMesh_IncrementalMesh."""
+    return _num_threads != 1
+
+
+def _init_worker(occ_threads):
+    import signal
+    import Utils.geom_utils_numba as geom_utils_nb
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure(occ_threads)
+    geom_utils_nb.warmup()
+
+
+def _run_sample(args):
+    import random
+    import feature_creation
+
+    combo, seed = args
+    shape, _ = feature_creation.shape_from_directive(combo, 'train', random.Random(seed))
+
+    return shape is not None
+
+
+def splits(num_cores, max_workers=None):
+    """(workers, OCC threads) pairs which use num_cores, at most max_workers processes."""
+    result = []
+    for num_workers in range(1, num_cores + 1):
+        if num_cores % num_workers != 0:
+            continue
+        if max_workers is not None and num_workers > max_workers:
+            continue
+        result.append((num_workers, num_cores // num_workers))
+
+    return result
+
+
+if __name__ == '__main__':
+    # run from the repository root: python -m Utils.occ_parallel --cores 16 --max-workers 8
+    import argparse
+    import os
+    import random
+    import time
+    from multiprocessing.pool import Pool
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="Cores to split")
+    parser.add_argument("--max-workers", type=int, default=None, help="Most processes the memory allows")
+    parser.add_argument("--samples", type=int, default=48, help="Samples generated for each split")
+    parser.add_argument("--features", type=int, nargs=2, default=[10, 14], help="Range of features per sample")
+    args = parser.parse_args()
+
+    plan_rng = random.Random(0)
+    tasks = [([plan_rng.randint(0, 23) for _ in range(plan_rng.randint(*args.features))], plan_rng.getrandbits(32))
+             for _ in range(args.samples)]
+
+    print(f'{"workers":>8}{"threads":>8}{"seconds":>10}{"samples/s":>11}{"done":>6}')
+    for num_workers, occ_threads in splits(args.cores, args.max_workers):
+        pool = Pool(processes=num_workers, initializer=_init_worker, initargs=(occ_threads,))
+        # wait for the workers to start before timing
+        pool.map(abs, range(num_workers))
+        start = time.perf_counter()
+        num_done = sum(pool.map(_run_sample, tasks, chunksize=1))
+        duration = time.perf_counter() - start
+        pool.close()
+        pool.join()
+        print(f'{num_workers:8d}{occ_threads:8d}{duration:10.1f}{len(tasks) / duration:11.2f}{num_done:6d}')
@@ -24,12 +24,14 @@ from OCC.Core.GeomLProp import GeomLProp_SLProps
 from OCC.Core.TopLoc import TopLoc_Location
 from OCC.Core.StlAPI import StlAPI_Reader
 from OCC.Core.BRepExtrema import BRepExtrema_DistShapeShape
+from OCC.Core.GCPnts import GCPnts_QuasiUniformDeflection
 from OCC.Core.BRepBuilderAPI import (BRepBuilderAPI_MakeVertex, BRepBuilderAPI_MakeEdge, BRepBuilderAPI_MakeWire,
                                      BRepBuilderAPI_MakeFace)
 from OCC.Core.TopTools import TopTools_IndexedDataMapOfShapeListOfShape
 from OCC.Core.TopOpeBRepBuild import TopOpeBRepBuild_Tools
 from OCC.Display import SimpleGui
 from OCC.Extend.TopologyUtils import TopologyExplorer, WireExplorer
+from OCCUtils.Topology import Topo
 import Utils.geom_utils as geom_utils
 
 SURFACE_TYPE = ['plane', 'cylinder', 'cone', 'sphere', 'torus', 'bezier', 'bspline', 'revolution', 'extrusion',
@@ -54,7 +56,8 @@ def list_face(shape):
         fset.add(face)
     return list(fset)
     """
-    topo = TopologyExplorer(shape)
+    # same faces in the same order as TopologyExplorer, without its quadratic IsSame filter
+    topo = Topo(shape, ignore_orientation=True)
 
     return list(topo.faces())
 
@@ -262,6 +265,33 @@ def dist_point_to_edges(the_pnt, edges):
     return min_d, nearest_pnt
 
 
+def edges_to_segments(edges, deflection=1e-3):
+    """Discretises edges into straight segments, lines are kept as they are, curves are approximated by polylines
+    deviating less than deflection from them.
+    input
+        edges: [TopoDS_Edge]
+    output
+        segs: [[[float, float, float] * 2]] * n
+    """
+    segs = []
+    for edge in edges:
+        if BRep_Tool.Degenerated(edge):
+            continue
+
+        curve = BRepAdaptor_Curve(edge)
+        if CURVE_TYPE[curve.GetType()] == 'line':
+            pnts = [curve.Value(curve.FirstParameter()), curve.Value(curve.LastParameter())]
+        else:
+            discretizer = GCPnts_QuasiUniformDeflection(curve, deflection)
+            assert discretizer.IsDone(), 'edge discretization failed'
+            pnts = [discretizer.Value(i) for i in range(1, discretizer.NbPoints() + 1)]
+
+        for i in range(len(pnts) - 1):
+            segs.append([as_list(pnts[i]), as_list(pnts[i + 1])])
+
+    return np.array(segs, dtype=np.float64).reshape(-1, 2, 3)
+
+
 '''
 input
     shape:          TopoDS_Shape
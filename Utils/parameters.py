@@ -7,14 +7,19 @@ stock_max_x = 100.0  # origin is 50
 stock_max_y = 100.0  # origin is 50
 stock_max_z = 100.0  # origin is 50
 
-stock_dim_x = None
-stock_dim_y = None
-stock_dim_z = None
-
 # General Feature Parameters
 min_len = 2.0  # 2
 clearance = 1  # 1
 inner_bounds_clearance = 2
+# evaluate every candidate bound before choosing one, as in the original generator, instead of evaluating them in
+# random order until one takes the feature, slower but reproduces datasets generated with it
+exhaustive_bounds = False
+# skip the bound search of a feature when the planar faces are too small or lack the straight edges its bounds need,
+# see MachiningFeature._infeasible_reason
+feasibility_check = True
+# deflections of the face triangulations the bounds are searched on and the rays are cast against
+mesh_linear_deflection = 0.1
+mesh_angular_deflection = 0.5
 
 # Round Parameters
 round_radius_min = 0.1
@@ -0,0 +1,171 @@
+"""
+One version of the working shape and everything the feature loop derives from it.
+
+shape_from_directive passes a ShapeState from feature to feature instead of the bare shape and its label maps.
+The face and edge lists, the topology index, the face normals, areas and edge lengths and the triangle sets are
+computed on first use, at most once per shape version. The caches of per face results (triangulations, edge
+convexity, candidate bounds) outlive a version, derive() hands them over to the state of the next shape.
+"""
+
+import copy
+
+import numpy as np
+
+from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
+from OCC.Core.GeomAbs import GeomAbs_Plane
+from OCC.Core.GProp import GProp_GProps
+from OCC.Core.BRepGProp import brepgprop
+from OCC.Core.TopExp import topexp
+from OCC.Extend.TopologyUtils import TopologyExplorer
+
+from OCCUtils.Topology import Topo
+
+import Utils.occ_utils as occ_utils
+from Utils.triangulation import TriangulationCache, triangulate_faces
+from Utils.topology import TopologyIndex, ConvexityCache
+from Utils.bound_cache import BoundCache
+
+
+class ShapeState:
+    """A shape, its labels and what is computed from them, treat it as immutable.
+
+    A feature never modifies a state, it returns the state of its new shape made by derive() or the state it was
+    given when it failed.
+    """
+    def __init__(self, shape, labels=None, mesh_cache=None, convexity_cache=None, bound_cache=None):
+        self._shape = shape
+        self._labels = labels
+        self.mesh_cache = mesh_cache if mesh_cache is not None else TriangulationCache()
+        self.convexity_cache = convexity_cache if convexity_cache is not None else ConvexityCache()
+        self.bound_cache = bound_cache if bound_cache is not None else BoundCache()
+        self._faces = None
+        self._edges = None
+        self._unique_edges = None
+        self._planar_faces = None
+        self._topology = None
+        self._normals = {}
+        self._areas = {}
+        self._line_lengths = {}
+        self._num_solids = None
+        self._meshed = False
+        self._triangles = None
+        self._planar_triangles = None
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def labels(self):
+        """Label map of the stock {face: label}, or (seg_map, inst_label, bottom_map) once a feature is added."""
+        return self._labels
+
+    def derive(self, shape, labels=None):
+        """State of a shape made from this one, the per face caches are shared."""
+        return ShapeState(shape, labels, self.mesh_cache, self.convexity_cache, self.bound_cache)
+
+    def with_labels(self, labels):
+        """The same shape version with other labels, what was already computed for the shape is kept."""
+        state = copy.copy(self)
+        state._labels = labels
+
+        return state
+
+    @property
+    def faces(self):
+        """Faces in the order of occ_utils.list_face, do not modify the list."""
+        if self._faces is None:
+            self._faces = occ_utils.list_face(self._shape)
+        return self._faces
+
+    @property
+    def edges(self):
+        """Edges as given by occ_utils.list_edge, do not modify the list."""
+        if self._edges is None:
+            self._edges = occ_utils.list_edge(self._shape)
+        return self._edges
+
+    @property
+    def unique_edges(self):
+        """Edges once each whatever their orientation, in the order of TopologyExplorer.edges."""
+        if self._unique_edges is None:
+            self._unique_edges = list(Topo(self._shape, ignore_orientation=True).edges())
+        return self._unique_edges
+
+    @property
+    def planar_faces(self):
+        if self._planar_faces is None:
+            self._planar_faces = [face for face in self.faces
+                                  if BRepAdaptor_Surface(face, True).GetType() == GeomAbs_Plane]
+        return self._planar_faces
+
+    @property
+    def topology(self):
+        """TopologyIndex of the shape."""
+        if self._topology is None:
+            self._topology = TopologyIndex(self._shape)
+        return self._topology
+
+    @property
+    def num_solids(self):
+        if self._num_solids is None:
+            self._num_solids = TopologyExplorer(self._shape).number_of_solids()
+        return self._num_solids
+
+    def normal(self, face):
+        """Normal at the center of a face as a float64 array, shared between callers, do not modify it."""
+        normal = self._normals.get(face)
+        if normal is None:
+            normal = np.array(occ_utils.as_list(occ_utils.normal_to_face_center(face)), dtype=np.float64)
+            self._normals[face] = normal
+
+        return normal
+
+    def face_area(self, face):
+        area = self._areas.get(face)
+        if area is None:
+            props = GProp_GProps()
+            brepgprop.SurfaceProperties(face, props)
+            area = props.Mass()
+            self._areas[face] = area
+
+        return area
+
+    def line_edge_lengths(self, face):
+        """Lengths of the straight edges of a face, longest first."""
+        lengths = self._line_lengths.get(face)
+        if lengths is None:
+            lengths = []
+            for edge in Topo(face, ignore_orientation=True).edges():
+                if occ_utils.type_edge(edge) != 'line':
+                    continue
+                pnt1 = np.array(occ_utils.as_list(topexp.FirstVertex(edge)))
+                pnt2 = np.array(occ_utils.as_list(topexp.LastVertex(edge)))
+                lengths.append(float(np.linalg.norm(pnt2 - pnt1)))
+            lengths.sort(reverse=True)
+            self._line_lengths[face] = lengths
+
+        return lengths
+
+    def triangulate(self):
+        """Meshes the faces without triangulation and synchronises the mesh cache with the shape, only once per shape
+        version.
+        """
+        if not self._meshed:
+            triangulate_faces(self.faces)
+            self.mesh_cache.update(self._shape, self.faces)
+            self._meshed = True
+
+    @property
+    def triangles(self):
+        """TriangleSet of all faces, the shape has to be triangulated."""
+        if self._triangles is None:
+            self._triangles = self.mesh_cache.triangle_set(self.faces)
+        return self._triangles
+
+    @property
+    def planar_triangles(self):
+        """TriangleSet of the planar faces, the shape has to be triangulated."""
+        if self._planar_triangles is None:
+            self._planar_triangles = self.mesh_cache.triangle_set(self.planar_faces)
+        return self._planar_triangles
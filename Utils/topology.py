@@ -0,0 +1,100 @@
+"""
+Adjacency maps of a shape, built once and shared by the bound finders of a feature.
+
+TopologyExplorer.faces_from_edge and occ_utils.face_adjacent run topexp.MapShapesAndAncestors over the whole shape
+on every call, which makes a pass over all edges quadratic in the number of edges.
+"""
+
+from OCC.Core.TopExp import topexp
+from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_EDGE, TopAbs_FORWARD
+from OCC.Core.TopoDS import topods, TopoDS_Face
+from OCC.Core.TopTools import TopTools_IndexedDataMapOfShapeListOfShape, TopTools_ListIteratorOfListOfShape
+from OCC.Core.TopOpeBRepBuild import TopOpeBRepBuild_Tools
+from OCC.Extend.TopologyUtils import TopologyExplorer
+
+
+def _ancestors(ancestor_map, shape, cast):
+    """Ancestors of shape in ancestor_map, each one only once as in TopologyExplorer."""
+    if not ancestor_map.Contains(shape):
+        return []
+
+    result = []
+    it = TopTools_ListIteratorOfListOfShape(ancestor_map.FindFromKey(shape))
+    while it.More():
+        ancestor = cast(it.Value())
+        if not any(ancestor.IsSame(other) for other in result):
+            result.append(ancestor)
+        it.Next()
+
+    return result
+
+
+class TopologyIndex:
+    """Edge to faces and face to wires maps of one shape.
+
+    The index is only valid for the shape it was built from, a new one has to be built after each feature.
+    """
+    def __init__(self, shape):
+        self.shape = shape
+        self.edge_face_map = TopTools_IndexedDataMapOfShapeListOfShape()
+        topexp.MapShapesAndAncestors(shape, TopAbs_EDGE, TopAbs_FACE, self.edge_face_map)
+        self._edge_faces = {}
+        self._face_wires = {}
+
+    def faces_from_edge(self, edge):
+        """Faces sharing an edge, in the order of TopologyExplorer.faces_from_edge."""
+        faces = self._edge_faces.get(edge)
+        if faces is None:
+            faces = _ancestors(self.edge_face_map, edge, topods.Face)
+            self._edge_faces[edge] = faces
+
+        return faces
+
+    def wires_from_face(self, face):
+        wires = self._face_wires.get(face)
+        if wires is None:
+            wires = list(TopologyExplorer(face).wires())
+            self._face_wires[face] = wires
+
+        return wires
+
+    def face_adjacent(self, face, edge):
+        """Same as occ_utils.face_adjacent without rebuilding the edge to faces map."""
+        adjface = TopoDS_Face()
+        if TopOpeBRepBuild_Tools.GetAdjacentFace(face, edge, self.edge_face_map, adjface):
+            return adjface
+        else:
+            return None
+
+
+class ConvexityCache:
+    """Convexity sign of the edges of the working shape, shared between consecutive features.
+
+    Entries are keyed by the forward oriented edge and remember the orientation they were computed for, since the
+    dihedral sign depends on it. The entry of an edge stays valid as long as the faces around it are untouched.
+    """
+    def __init__(self):
+        self._signs = {}
+
+    def __len__(self):
+        return len(self._signs)
+
+    def get(self, edge):
+        """Returns the cached sign of an edge, None if it has to be computed."""
+        entry = self._signs.get(edge.Oriented(TopAbs_FORWARD))
+        if entry is None or entry[0] != edge.Orientation():
+            return None
+
+        return entry[1]
+
+    def set(self, edge, sign):
+        self._signs[edge.Oriented(TopAbs_FORWARD)] = (edge.Orientation(), sign)
+
+    def invalidate(self, faces):
+        """Drops the entries of the edges bounding the given faces."""
+        for face in faces:
+            for edge in TopologyExplorer(face).edges():
+                self._signs.pop(edge.Oriented(TopAbs_FORWARD), None)
+
+    def clear(self):
+        self._signs.clear()
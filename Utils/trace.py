@@ -0,0 +1,172 @@
+"""
+Per-sample trace records of the generation pipeline.
+
+generate_shape opens a record with begin() and closes it with end(), in between the pipeline reports:
+    with stage('bound_search'): ...    time spent in a stage, summed over the sample
+    with feature('blind_hole'): ...    one entry per attempted machining feature
+    fail('no bounds')                  reason why the current feature (or the sample, outside a feature) failed
+All calls are no-ops while no record is open. The records are JSON serialisable, main.py appends them to
+<dataset>/trace.jsonl and summarize() ranks the hot stages and the features that fail most.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+
+_record = None
+_feature = None
+
+
+def begin(name, subset=None):
+    """Opens the record of a sample, the previous record of this process is dropped."""
+    global _record, _feature
+    _record = {'name': name, 'subset': subset, 'status': None, 'reason': None, 'tries': 0,
+               'duration': time.perf_counter(), 'stages': {}, 'features': []}
+    _feature = None
+
+    return _record
+
+
+def end(status):
+    """Closes the current record and returns it, None if no record is open."""
+    global _record, _feature
+    record = _record
+    if record is None:
+        return None
+
+    record['status'] = status
+    record['duration'] = time.perf_counter() - record['duration']
+    _record = None
+    _feature = None
+
+    return record
+
+
+def new_try():
+    if _record is not None:
+        _record['tries'] += 1
+
+
+def fail(reason):
+    """Records why the current feature, or the sample when no feature is open, failed."""
+    if _feature is not None:
+        _feature['reason'] = reason
+    elif _record is not None:
+        _record['reason'] = reason
+
+
+@contextmanager
+def stage(name):
+    if _record is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = _record['stages'].setdefault(name, [0.0, 0])
+        entry[0] += time.perf_counter() - start
+        entry[1] += 1
+
+
+@contextmanager
+def feature(feat_type):
+    """Entry of one machining feature, the caller sets entry['applied'] when the feature made it into the shape."""
+    global _feature
+    if _record is None:
+        yield {}
+        return
+
+    entry = {'type': feat_type, 'applied': False, 'reason': None, 'duration': time.perf_counter()}
+    _record['features'].append(entry)
+    _feature = entry
+    try:
+        yield entry
+    finally:
+        entry['duration'] = time.perf_counter() - entry['duration']
+        _feature = None
+
+
+class TraceLog:
+    """Appends trace records as JSON lines, truncate drops the records already in the file."""
+    def __init__(self, pathname, truncate=False):
+        self.fp = open(pathname, 'w' if truncate else 'a', encoding='utf8')
+
+    def write(self, record):
+        if record is not None:
+            self.fp.write(json.dumps(record) + '\n')
+            self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+
+def load_records(pathname):
+    records = []
+    with open(pathname, 'r') as fp:
+        for line in fp:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+
+    return records
+
+
+def summarize(records, top=10):
+    """Prints the stages ranked by total time and the feature types ranked by failure rate.
+
+    :param records: Trace records as returned by end().
+    :param top: Number of rows of each table.
+    :return: stage totals {stage: [seconds, calls]}, feature totals {type: [attempts, failures, seconds]}
+    """
+    stages = {}
+    features = {}
+    reasons = {}
+    feat_reasons = {}
+    num_failed = 0
+    total_time = 0.0
+    for record in records:
+        total_time += record['duration']
+        if record['status'] != 'done':
+            num_failed += 1
+            reasons[record['reason']] = reasons.get(record['reason'], 0) + 1
+        for name, (duration, calls) in record['stages'].items():
+            entry = stages.setdefault(name, [0.0, 0])
+            entry[0] += duration
+            entry[1] += calls
+        for feat in record['features']:
+            entry = features.setdefault(feat['type'], [0, 0, 0.0])
+            entry[0] += 1
+            entry[2] += feat['duration']
+            if not feat['applied']:
+                entry[1] += 1
+                key = (feat['type'], feat['reason'])
+                feat_reasons[key] = feat_reasons.get(key, 0) + 1
+
+    print(f'{len(records)} samples, {num_failed} failed, {total_time:.1f} s')
+    for reason, count in sorted(reasons.items(), key=lambda x: -x[1])[:top]:
+        print(f'    {count:8d}  {reason}')
+
+    print('Hot stages:')
+    print(f'    {"stage":<24}{"total s":>12}{"share":>8}{"calls":>10}{"ms/call":>10}')
+    for name, (duration, calls) in sorted(stages.items(), key=lambda x: -x[1][0])[:top]:
+        share = duration / total_time if total_time > 0 else 0.0
+        print(f'    {name:<24}{duration:12.1f}{share:8.1%}{calls:10d}{1000 * duration / calls:10.2f}')
+
+    print('Features failing most:')
+    print(f'    {"feature":<28}{"tries":>8}{"failed":>8}{"rate":>8}{"total s":>10}')
+    for feat_type, (attempts, failures, duration) in sorted(features.items(),
+                                                           key=lambda x: -x[1][1] / x[1][0])[:top]:
+        print(f'    {feat_type:<28}{attempts:8d}{failures:8d}{failures / attempts:8.1%}{duration:10.1f}')
+    for (feat_type, reason), count in sorted(feat_reasons.items(), key=lambda x: -x[1])[:top]:
+        print(f'    {count:8d}  {feat_type}: {reason}')
+
+    return stages, features
+
+
+if __name__ == '__main__':
+    import sys
+
+    summarize(load_records(sys.argv[1] if len(sys.argv) > 1 else 'HeteroMF/trace.jsonl'))
@@ -0,0 +1,290 @@
+"""
+Per-face triangulation store shared by the bound search, depth probing and machinability checks.
+"""
+
+import numpy as np
+
+from OCC.Core.BRep import BRep_Tool, BRep_Builder
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopoDS import TopoDS_Compound
+
+import Utils.occ_utils as occ_utils
+import Utils.parameters as param
+import Utils.occ_parallel as occ_parallel
+import Utils.geom_utils_numba as geom_utils_nb
+
+
+def triangulate_shape(shape):
+    mesh = BRepMesh_IncrementalMesh(shape, param.mesh_linear_deflection, False, param.mesh_angular_deflection,
+                                    occ_parallel.mesh_in_parallel())
+    mesh.Perform()
+    assert mesh.IsDone()
+
+
+def triangulate_faces(faces):
+    """Meshes the faces which carry no triangulation yet.
+
+    Faces left untouched by a feature keep the triangulation of the previous shape, only those made or modified by
+    the feature need the mesher. They are meshed together in one compound, the edges they share with meshed faces
+    keep their discretization, so the triangulations stay conforming.
+
+    :param faces: Faces of the shape.
+    :return: number of faces meshed
+    """
+    builder = BRep_Builder()
+    compound = TopoDS_Compound()
+    builder.MakeCompound(compound)
+    num_faces = 0
+    for face in faces:
+        if triangulation_stamp(face) is None:
+            builder.Add(compound, face)
+            num_faces += 1
+
+    if num_faces > 0:
+        triangulate_shape(compound)
+
+    return num_faces
+
+
+def triangulation_from_face(face):
+    """Extracts the triangulation of a meshed face.
+
+    :param face: TopoDS_Face which has already been meshed by BRepMesh_IncrementalMesh.
+    :return: pts (N, 3) float64 array, triangles (M, 3) int64 array with sorted node ids.
+    """
+    aLoc = TopLoc_Location()
+    aTriangulation = BRep_Tool().Triangulation(face, aLoc)
+    aTrsf = aLoc.Transformation()
+
+    aNodes = aTriangulation.Nodes()
+    aTriangles = aTriangulation.Triangles()
+
+    pts = np.zeros((aTriangulation.NbNodes(), 3), dtype=np.float64)
+    for i in range(1, aTriangulation.NbNodes() + 1):
+        pt = aNodes.Value(i)
+        pt.Transform(aTrsf)
+        pts[i - 1] = pt.X(), pt.Y(), pt.Z()
+
+    triangles = np.zeros((aTriangulation.NbTriangles(), 3), dtype=np.int64)
+    for i in range(1, aTriangulation.NbTriangles() + 1):
+        triangles[i - 1] = aTriangles.Value(i).Get()
+    triangles -= 1
+    triangles.sort(axis=1)
+
+    return pts, triangles
+
+
+def triangulation_stamp(face):
+    """Cheap signature of the triangulation currently attached to a face."""
+    aTriangulation = BRep_Tool().Triangulation(face, TopLoc_Location())
+    if aTriangulation is None:
+        return None
+
+    return aTriangulation.NbNodes(), aTriangulation.NbTriangles()
+
+
+class FaceMesh:
+    """Triangulation of one B-Rep face stored as NumPy arrays.
+
+    The vertex-to-triangle and edge-to-triangle maps are only built when asked for.
+    """
+    def __init__(self, pts, triangles, stamp=None):
+        self.pts = pts
+        self.triangles = triangles
+        self.stamp = stamp
+        self._tri_coords = None
+        self._bvh = None
+        self._vt_map = None
+        self._et_map = None
+
+    @property
+    def tri_coords(self):
+        """(M, 3, 3) array with the coordinates of each triangle."""
+        if self._tri_coords is None:
+            self._tri_coords = self.pts[self.triangles]
+        return self._tri_coords
+
+    @property
+    def bvh(self):
+        """(node_bboxes, node_info, order) of the BVH over the triangles of this face."""
+        if self._bvh is None:
+            self._bvh = geom_utils_nb.build_bvh(geom_utils_nb.triangle_bboxes(self.tri_coords))
+        return self._bvh
+
+    @property
+    def vt_map(self):
+        """{node id: [triangle id]}"""
+        if self._vt_map is None:
+            self._build_maps()
+        return self._vt_map
+
+    @property
+    def et_map(self):
+        """{(node id, node id): [triangle id]}"""
+        if self._et_map is None:
+            self._build_maps()
+        return self._et_map
+
+    def _build_maps(self):
+        vt_map = {}
+        et_map = {}
+        for i, (n0, n1, n2) in enumerate(self.triangles.tolist()):
+            for pid in (n0, n1, n2):
+                vt_map.setdefault(pid, []).append(i)
+
+            for edge in ((n0, n1), (n0, n2), (n1, n2)):
+                et_map.setdefault(edge, []).append(i)
+
+        self._vt_map = vt_map
+        self._et_map = et_map
+
+
+class TriangleSet:
+    """Triangles of a set of faces with a two level BVH for ray casting.
+
+    The per face BVHs come from the FaceMesh entries and are only built once per face, assembling a set only
+    concatenates them and builds the small top level BVH over the face boxes.
+    """
+    def __init__(self, meshes):
+        num_faces = len(meshes)
+        tri_list = []
+        node_bboxes = []
+        node_info = []
+        node_order = []
+        face_roots = np.zeros(num_faces, dtype=np.int64)
+        face_bboxes = np.zeros((num_faces, 2, 3), dtype=np.float64)
+
+        tri_offset = 0
+        node_offset = 0
+        for i, mesh in enumerate(meshes):
+            bboxes, info, order = mesh.bvh
+            info = info.copy()
+            inner = info[:, 0] >= 0
+            info[inner, 0] += node_offset
+            info[~inner, 1] += tri_offset
+
+            tri_list.append(mesh.tri_coords)
+            node_bboxes.append(bboxes)
+            node_info.append(info)
+            node_order.append(order + tri_offset)
+            face_roots[i] = node_offset
+            face_bboxes[i] = bboxes[0]
+
+            tri_offset += mesh.tri_coords.shape[0]
+            node_offset += bboxes.shape[0]
+
+        if num_faces == 0:
+            self.tri_list = np.zeros((0, 3, 3), dtype=np.float64)
+            self.node_bboxes = np.zeros((0, 2, 3), dtype=np.float64)
+            self.node_info = np.zeros((0, 3), dtype=np.int64)
+            self.node_order = np.zeros(0, dtype=np.int64)
+        else:
+            self.tri_list = np.concatenate(tri_list, axis=0)
+            self.node_bboxes = np.concatenate(node_bboxes, axis=0)
+            self.node_info = np.concatenate(node_info, axis=0)
+            self.node_order = np.concatenate(node_order, axis=0)
+        self.face_roots = face_roots
+        self.top_bboxes, self.top_info, self.top_order = geom_utils_nb.build_bvh(face_bboxes, 2)
+
+    def __len__(self):
+        return self.tri_list.shape[0]
+
+    def _scene(self):
+        return (self.tri_list, self.top_bboxes, self.top_info, self.top_order, self.face_roots,
+                self.node_bboxes, self.node_info, self.node_order)
+
+    def nearest(self, ray_origins, ray_direction):
+        """Distance to the nearest hit of each ray, NINF for the rays which hit nothing."""
+        ray_origins = np.ascontiguousarray(ray_origins, dtype=np.float64)
+        ray_direction = np.ascontiguousarray(ray_direction, dtype=np.float64)
+
+        return geom_utils_nb.rays_scene_intersect(ray_origins, ray_direction, *self._scene())
+
+    def any_hit(self, ray_origins, ray_direction):
+        """Checks if any of the rays hits a triangle."""
+        ray_origins = np.ascontiguousarray(ray_origins, dtype=np.float64)
+        ray_direction = np.ascontiguousarray(ray_direction, dtype=np.float64)
+
+        return geom_utils_nb.rays_hit_scene(ray_origins, ray_direction, *self._scene())
+
+
+class TriangulationCache:
+    """Triangulations of the faces of the working shape, keyed by face.
+
+    Faces which are left untouched by a feature keep their TShape, hence their key and their triangulation,
+    so only the faces modified or deleted by BRepFeat_MakePrism have to be dropped after each feature.
+    """
+    def __init__(self):
+        self._meshes = {}
+
+    def __len__(self):
+        return len(self._meshes)
+
+    def __contains__(self, face):
+        return face in self._meshes
+
+    def get(self, face):
+        """Returns the FaceMesh of a face, extracting it on first access."""
+        mesh = self._meshes.get(face)
+        if mesh is None:
+            pts, triangles = triangulation_from_face(face)
+            mesh = FaceMesh(pts, triangles, (pts.shape[0], triangles.shape[0]))
+            self._meshes[face] = mesh
+
+        return mesh
+
+    def update(self, shape, faces=None):
+        """Synchronises the cache with a freshly meshed shape.
+
+        Call after triangulate_shape, entries of faces which were re-meshed since they were cached are refreshed.
+        :param faces: Faces of shape, if already listed.
+        """
+        if faces is None:
+            faces = occ_utils.list_face(shape)
+        for face in faces:
+            mesh = self._meshes.get(face)
+            if mesh is not None and mesh.stamp != triangulation_stamp(face):
+                del self._meshes[face]
+            self.get(face)
+
+    def invalidate(self, faces):
+        """Drops the entries of the given faces."""
+        for face in faces:
+            self._meshes.pop(face, None)
+
+    def clear(self):
+        self._meshes.clear()
+
+    def triangle_set(self, faces):
+        """Returns a TriangleSet over the triangles of the given faces."""
+        return TriangleSet([self.get(face) for face in faces])
+
+
+if __name__ == '__main__':
+    # meshing the whole shape against meshing the faces of the last feature, on a plate drilled hole after hole
+    import time
+    from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCylinder
+    from OCC.Core.gp import gp_Ax2, gp_Pnt, gp_Dir
+
+    num_holes = 12
+    full_time = 0.0
+    incremental_time = 0.0
+    shapes = [BRepPrimAPI_MakeBox(10.0 * num_holes, 10.0, 5.0).Shape() for _ in range(2)]
+    for i in range(num_holes):
+        for k in range(2):
+            hole = BRepPrimAPI_MakeCylinder(gp_Ax2(gp_Pnt(10.0 * i + 5.0, 5.0, -1.0), gp_Dir(0.0, 0.0, 1.0)),
+                                            3.0, 7.0).Shape()
+            shapes[k] = BRepAlgoAPI_Cut(shapes[k], hole).Shape()
+
+        start = time.perf_counter()
+        triangulate_shape(shapes[0])
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        num_meshed = triangulate_faces(occ_utils.list_face(shapes[1]))
+        incremental_time += time.perf_counter() - start
+        print(f'hole {i + 1}: {num_meshed} of {len(occ_utils.list_face(shapes[1]))} faces meshed')
+
+    print(f'whole shape {1000 * full_time:.1f} ms, new faces only {1000 * incremental_time:.1f} ms')
@@ -9,6 +9,7 @@ from OCC.Core.TopoDS import TopoDS_Solid
 from OCC.Core.STEPControl import STEPControl_Reader
 
 from Utils.occ_utils import list_face
+from Utils.labels import instance_label_size
 
 # occwl
 from occwl.solid import Solid
@@ -105,6 +106,7 @@ if __name__ == '__main__':
             # check length of label
             file_id, label = label_data[0]
             seg_label, inst_label, bottom_label = label['seg'], label['inst'], label['bottom']
+            num_inst_labels = instance_label_size(inst_label, label.get('inst_format', 'matrix'))
             # check map between face id and segmentation label
             if num_faces != len(seg_label):
                 print('File {} have wrong number of seg labels {} with step faces {}. '.format(
@@ -112,9 +114,9 @@ if __name__ == '__main__':
                 wrong_files.append((step_file, labels_file))
                 continue
             # check relation_matrix describing the feature instances
-            if num_faces != len(inst_label):
+            if num_faces != num_inst_labels:
                 print('File {} have wrong number of instance labels {} with step faces {}. '.format(
-                    fn, len(inst_label), num_faces))
+                    fn, num_inst_labels, num_faces))
                 wrong_files.append((step_file, labels_file))
                 continue
             # check map between face id and bottom identification label
@@ -170,6 +172,7 @@ if __name__ == '__main__':
             # check length of label
             file_id, label = label_data[0]
             seg_label, inst_label, bottom_label = label['seg'], label['inst'], label['bottom']
+            num_inst_labels = instance_label_size(inst_label, label.get('inst_format', 'matrix'))
             # check map between face id and segmentation label
             if num_faces != len(seg_label):
                 print('File {} have wrong number of seg labels {} with step faces {}. '.format(
@@ -177,9 +180,9 @@ if __name__ == '__main__':
                 wrong_files.append((step_file, labels_file))
                 continue
             # check relation_matrix describing the feature instances
-            if num_faces != len(inst_label):
+            if num_faces != num_inst_labels:
                 print('File {} have wrong number of instance labels {} with step faces {}. '.format(
-                    fn, len(inst_label), num_faces))
+                    fn, num_inst_labels, num_faces))
                 wrong_files.append((step_file, labels_file))
                 continue
             # check map between face id and bottom identification label
@@ -3,13 +3,15 @@ import random
 import numpy as np
 
 from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
-from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
 from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakeWire, BRepBuilderAPI_MakeEdge
 from OCC.Core.gp import gp_Pnt
 
 import Utils.shape_factory as shape_factory
 import Utils.parameters as param
 import Utils.occ_utils as occ_utils
+import Utils.labels as labels
+import Utils.trace as trace
+from Utils.shape_state import ShapeState
 
 from Features.o_ring import ORing
 from Features.through_hole import ThroughHole
@@ -61,15 +63,8 @@ through_blind_features = ["triangular_passage", "rectangular_passage", "6sides_p
                           "Oring"]
 
 
-def triangulate_shape(shape):
-    linear_deflection = 0.1
-    angular_deflection = 0.5
-    mesh = BRepMesh_IncrementalMesh(shape, linear_deflection, False, angular_deflection, True)
-    mesh.Perform()
-    assert mesh.IsDone()
-
-
-def generate_stock_dims(larger_stock):
+def generate_stock_dims(larger_stock, rng=random):
+    """Draws the (x, y, z) size of the stock."""
     if larger_stock:  # too much features need larger stock for avoiding wrong topology
         stock_min_x = param.stock_min_x * 2
         stock_min_y = param.stock_min_y * 2
@@ -78,9 +73,11 @@ def generate_stock_dims(larger_stock):
         stock_min_x = param.stock_min_x
         stock_min_y = param.stock_min_y
         stock_min_z = param.stock_min_z
-    param.stock_dim_x = random.uniform(stock_min_x, param.stock_max_x)
-    param.stock_dim_y = random.uniform(stock_min_y, param.stock_max_y)
-    param.stock_dim_z = random.uniform(stock_min_z, param.stock_max_z)
+    stock_dim_x = rng.uniform(stock_min_x, param.stock_max_x)
+    stock_dim_y = rng.uniform(stock_min_y, param.stock_max_y)
+    stock_dim_z = rng.uniform(stock_min_z, param.stock_max_z)
+
+    return stock_dim_x, stock_dim_y, stock_dim_z
 
 
 def rearrange_combo(combination):
@@ -167,7 +164,17 @@ def rearrange_combo_planar(combination):
     return new_combination
 
 
-def shape_from_directive(combo, subset):
+def shape_from_directive(combo, subset, rng=None):
+    """
+    Applies the machining features of combo to a random stock
+    :param combo: Machining feature ids.
+    :param subset: Sub dataset name.
+    :param rng: random.Random all random choices of the sample are drawn from, a sample is regenerated from the
+                same seed, the random module is used when not given.
+    :return: shape, labels
+    """
+    if rng is None:
+        rng = random
     try_cnt = 0
     find_edges = True
     combo = rearrange_combo(combo)  # rearrange machining feature combinations
@@ -178,52 +185,71 @@ def shape_from_directive(combo, subset):
         # random stock size
         if len(combo) >= 10:
             # too much features need larger stock for avoiding wrong topology
-            generate_stock_dims(larger_stock=True)
+            stock_dims = generate_stock_dims(larger_stock=True, rng=rng)
         else:
-            generate_stock_dims(larger_stock=False)
+            stock_dims = generate_stock_dims(larger_stock=False, rng=rng)
         # create stock
-        shape = BRepPrimAPI_MakeBox(param.stock_dim_x, param.stock_dim_y, param.stock_dim_z).Shape()
+        state = ShapeState(BRepPrimAPI_MakeBox(*stock_dims).Shape())
         # non-feature faces are labeled as stock
-        label_map = shape_factory.map_from_name(shape, param.feat_names.index('stock'))
+        state = state.with_labels(shape_factory.map_from_name(state, param.feat_names.index('stock')))
+        # the states of the following shapes share the triangulations of the faces untouched by a feature,
+        # the convexity signs of the edges around them and the candidate bounds on them
 
         for fid in combo:
             feat_name = param.feat_names[fid]
-            if feat_name == "chamfer":
-                edges = occ_utils.list_edge(shape)
-                # create new feature object
-                new_feat = feat_classes[feat_name](shape, label_map, param.min_len,
-                                                   param.clearance, param.feat_names, edges)
-                shape, label_map, edges = new_feat.add_feature()
-
-                if len(edges) == 0:
-                    break
-
-            elif feat_name == "round":
-                if find_edges:
-                    edges = occ_utils.list_edge(shape)
-                    find_edges = False
-
-                new_feat = feat_classes[feat_name](shape, label_map, param.min_len,
-                                                   param.clearance, param.feat_names, edges)
-                shape, label_map, edges = new_feat.add_feature()
-
-                if len(edges) == 0:
-                    break
-
-            else:
-                triangulate_shape(shape)  # mesh curved surface ???
-                new_feat = feat_classes[feat_name](shape, label_map, param.min_len, param.clearance, param.feat_names)
-                if count == 0:
-                    shape, label_map, bounds = new_feat.add_feature(bounds, subset, find_bounds=True)
-
-                    if feat_name in through_blind_features:
+            old_state = state
+            with trace.feature(feat_name) as feat_entry:
+                if feat_name == "chamfer":
+                    edges = list(state.edges)
+                    # create new feature object
+                    new_feat = feat_classes[feat_name](state, state.labels, param.min_len,
+                                                       param.clearance, param.feat_names, edges, rng)
+                    with trace.stage('fillet'):
+                        state, edges = new_feat.add_feature()
+                    feat_entry['applied'] = state is not old_state
+                    # no face history is tracked for fillets, the edges around them are classified again
+                    state.convexity_cache.clear()
+                    state.bound_cache.clear()
+
+                    if len(edges) == 0:
+                        break
+
+                elif feat_name == "round":
+                    if find_edges:
+                        edges = list(state.edges)
+                        find_edges = False
+
+                    new_feat = feat_classes[feat_name](state, state.labels, param.min_len,
+                                                       param.clearance, param.feat_names, edges, rng)
+                    with trace.stage('fillet'):
+                        state, edges = new_feat.add_feature()
+                    feat_entry['applied'] = state is not old_state
+                    # no face history is tracked for fillets, the edges around them are classified again
+                    state.convexity_cache.clear()
+                    state.bound_cache.clear()
+
+                    if len(edges) == 0:
+                        break
+
+                else:
+                    # the shape is triangulated by add_feature, unless the feature cannot fit
+                    new_feat = feat_classes[feat_name](state, state.labels, param.min_len, param.clearance,
+                                                       param.feat_names, rng, stock_dims)
+                    if count == 0:
+                        state, bounds = new_feat.add_feature(bounds, subset, find_bounds=True)
+
+                        if feat_name in through_blind_features:
+                            count += 1
+
+                    else:  # I think it should find bounds after each feature created besides from inner bounds
+                        # only the faces changed by the previous features are searched again, see bound_cache
+                        # original: find_bounds=False
+                        state, bounds = new_feat.add_feature(bounds, subset, find_bounds=True)
                         count += 1
+                    feat_entry['applied'] = state is not old_state
 
-                else:  # I think it should find bounds after each feature created besides from inner bounds
-                    # may slow generation speed
-                    shape, label_map, bounds = new_feat.add_feature(bounds, subset, find_bounds=True)  # original: False
-                    count += 1
-
+        shape = state.shape
+        label_map = state.labels
         if shape is not None:
             break
 
@@ -257,43 +283,60 @@ def display_bounds(bounds, display, color):
     return display
 
 
-def get_segmentation_label(faces_list, seg_map):
+def get_face_index_map(faces_list):
+    """
+    Create map between face and its index in faces_list, shared by the label builders
+    """
+    face_ids = {}
+    for face_idx, face in enumerate(faces_list):
+        face_ids.setdefault(face, face_idx)
+
+    return face_ids
+
+
+def get_segmentation_label(faces_list, seg_map, face_ids=None):
     """
     Create map between face id and segmentation label
     """
+    if face_ids is None:
+        face_ids = get_face_index_map(faces_list)
+
     faceid_label_map = {}
     for face in faces_list:
-        face_idx = faces_list.index(face)    
+        face_idx = face_ids[face]
         faceid_label_map[face_idx] = seg_map[face]
 
     return faceid_label_map
 
 
-def get_instance_label(faces_list, num_faces, inst_map):
+def get_instance_groups(faces_list, inst_map, face_ids=None):
     """
-    Create relation_matrix describing the feature instances
+    Create list of face ids of each feature instance
     """
-    relation_matrix = np.zeros((num_faces, num_faces), dtype=np.uint8)
+    if face_ids is None:
+        face_ids = get_face_index_map(faces_list)
 
+    inst_groups = []
     for inst in inst_map:
-        for row_inst_face in inst:
-            if row_inst_face not in faces_list:
-                print('WARNING! missing face', row_inst_face.__hash__())
+        inst_face_idx = []
+        for inst_face in inst:
+            if inst_face not in face_ids:
+                print('WARNING! missing face', inst_face.__hash__())
                 continue
-            row_face_idx = faces_list.index(row_inst_face) 
-            # In the face_idx row，all instance faces are labeled as 1
-            for col_inst_face in inst:
-                if col_inst_face not in faces_list:
-                    print('WARNING! missing face', col_inst_face.__hash__())
-                    continue
-                col_face_idx = faces_list.index(col_inst_face)
-                # pythonocc index starts from 1
-                relation_matrix[row_face_idx][col_face_idx] = 1
+            inst_face_idx.append(face_ids[inst_face])
+        inst_groups.append(inst_face_idx)
 
-    assert relation_matrix.nonzero(), 'relation_matrix is empty'
-    assert np.allclose(relation_matrix, relation_matrix.T), 'relation_matrix is not symmetric'
+    return inst_groups
+
+
+def get_instance_label(faces_list, num_faces, inst_map, face_ids=None, inst_format='matrix'):
+    """
+    Create instance label describing the feature instances, by default the dense relation_matrix,
+    see Utils/labels.py for the sparse formats, None if the instances overlap and inst_format cannot represent it
+    """
+    inst_groups = get_instance_groups(faces_list, inst_map, face_ids)
 
-    return relation_matrix.tolist()
+    return labels.encode_instance_label(inst_groups, num_faces, inst_format)
 
 
 def save_json_data(pathname, data):
@@ -319,19 +362,20 @@ if __name__ == '__main__':
     #     print(f.__hash__())
 
     faces_list = occ_utils.list_face(a_shape)
+    face_ids = get_face_index_map(faces_list)
     # Create map between face id and segmentation label
-    seg_label = get_segmentation_label(faces_list, seg_map)
+    seg_label = get_segmentation_label(faces_list, seg_map, face_ids)
     assert len(seg_label) == len(faces_list)
     print(seg_label)
 
     # Create relation_matrix describing the feature instances
-    relation_matrix = get_instance_label(faces_list, len(faces_list), inst_label)
+    relation_matrix = get_instance_label(faces_list, len(faces_list), inst_label, face_ids)
     assert len(seg_label) == len(relation_matrix)
     for row in relation_matrix:
         print(row)
 
     # Create map between face id and bottom identification label
-    bottom_label = get_segmentation_label(faces_list, bottom_map)
+    bottom_label = get_segmentation_label(faces_list, bottom_map, face_ids)
     assert len(seg_label) == len(bottom_label)
     print(bottom_label)
 
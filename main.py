@@ -6,12 +6,10 @@ The number of machining features is defined by the combination range.
 To change the parameters of each machining feature, please see parameters.py
 """
 
-from itertools import repeat
 import Utils.shape as shape
 import random
 import os
-import gc
-import time
+import argparse
 from tqdm import tqdm
 from multiprocessing.pool import Pool
 
@@ -27,6 +25,12 @@ from OCC.Core.TopoDS import (
 from OCC.Extend.DataExchange import STEPControl_Writer
 
 import Utils.occ_utils as occ_utils
+import Utils.geom_utils_numba as geom_utils_nb
+import Utils.labels as label_utils
+import Utils.manifest as manifest
+import Utils.trace as trace
+import Utils.occ_parallel as occ_parallel
+from Utils.label_store import LabelShardWriter
 import feature_creation
 
 
@@ -62,10 +66,11 @@ def directive(combo, count, subset):
 
     seg_map, inst_map = labels[0], labels[1]
     faces_list = occ_utils.list_face(shape)
+    face_ids = feature_creation.get_face_index_map(faces_list)
     # Create map between face id and segmentation label
-    seg_label = feature_creation.get_segmentation_label(faces_list, seg_map)
+    seg_label = feature_creation.get_segmentation_label(faces_list, seg_map, face_ids)
     # Create relation_matrix describing the feature instances
-    relation_matrix = feature_creation.get_instance_label(faces_list, len(seg_map), inst_map)
+    relation_matrix = feature_creation.get_instance_label(faces_list, len(seg_map), inst_map, face_ids)
 
     return shapes, shape_name, (seg_label, relation_matrix)
 
@@ -75,13 +80,17 @@ def save_shape(shape, step_path, label_map):
     shape_with_fid_to_step(step_path, shape, label_map)
 
 
-def save_label(shape_name, pathname, seg_label, relation_matrix, bottom_label):
+def save_label(shape_name, pathname, seg_label, relation_matrix, bottom_label, inst_format='matrix'):
     import json
     """
     Export a data to a json file
     """
+    label = {'seg': seg_label, 'inst': relation_matrix, 'bottom': bottom_label}
+    if inst_format != 'matrix':
+        # the reader needs to know how to expand the instance label, see Utils/labels.py
+        label['inst_format'] = inst_format
     data = [
-        [shape_name, {'seg': seg_label, 'inst': relation_matrix, 'bottom': bottom_label}]
+        [shape_name, label]
     ]
     with open(pathname, 'w', encoding='utf8') as fp:
         json.dump(data, fp, indent=4, ensure_ascii=False, sort_keys=False)
@@ -90,35 +99,45 @@ def save_label(shape_name, pathname, seg_label, relation_matrix, bottom_label):
 def generate_shape(args):
     """
     Generate num_shapes random shapes in dataset_dir
-    :param args: List of [shape directory path, shape name, machining feature combo, sub dataset name]
-    :return: None
+    :param args: List of [shape directory path, (shape name, machining feature combo), sub dataset name,
+                 instance label format, random seed]
+    :return: shape name, (seg label, instance label, bottom label) of the saved shape or None if all tries failed,
+             trace record of the sample
     """
-    dataset_dir, combo, subset = args
+    dataset_dir, combo, subset, inst_format, seed = args
     f_name, combination = combo
+    # all random choices of the sample come from its own generator, so it can be regenerated alone from its seed
+    rng = random.Random(seed)
+    trace.begin(str(f_name), subset)
 
     num_try = 0  # first try
     while True:
         num_try += 1
+        trace.new_try()
         print('try count', num_try)
         if num_try > 3:
             # fails too much, pass
             print('number of fails > 3, pass')
             break
+        trace.fail(None)
 
         try:
-            shape, labels = feature_creation.shape_from_directive(combination, subset)
+            shape, labels = feature_creation.shape_from_directive(combination, subset, rng)
         except Exception as e:
             print('Fail to generate:')
             print(e)
+            trace.fail('exception ' + type(e).__name__)
             continue
 
         if shape is None:
             print('generated shape is None')
+            trace.fail('shape is None')
             continue
     
         # check generated shape has supported type (TopoDS_Solid, TopoDS_Compound, TopoDS_CompSolid)
         if not isinstance(shape, (TopoDS_Solid, TopoDS_Compound, TopoDS_CompSolid)):
             print('generated shape is {}, not supported'.format(type(shape)))
+            trace.fail('unsupported shape type')
             continue
         
         # get the corresponding semantic segmentation, instance and bottom labels
@@ -126,24 +145,37 @@ def generate_shape(args):
         faces_list = occ_utils.list_face(shape)
         if len(faces_list) == 0:
             print('empty shape')
+            trace.fail('empty shape')
+            continue
+        with trace.stage('labels'):
+            # one face to index map shared by the three label builders
+            face_ids = feature_creation.get_face_index_map(faces_list)
+            # Create map between face id and segmentation label
+            seg_label = feature_creation.get_segmentation_label(faces_list, seg_map, face_ids)
+            # Create relation_matrix describing the feature instances
+            relation_matrix = feature_creation.get_instance_label(faces_list, len(seg_map), inst_label, face_ids,
+                                                                  inst_format)
+            # Create map between face id and bottom identification label
+            bottom_label = feature_creation.get_segmentation_label(faces_list, bottom_map, face_ids)
+        if relation_matrix is None:
+            print('generated shape has faces in several instances, not supported by {} labels'.format(inst_format))
+            trace.fail('overlapping instances')
             continue
-        # Create map between face id and segmentation label
-        seg_label = feature_creation.get_segmentation_label(faces_list, seg_map)
         if len(seg_label) != len(faces_list):
             print('generated shape has wrong number of seg labels {} with step faces {}. '.format(
                 len(seg_label), len(faces_list)))
+            trace.fail('wrong number of seg labels')
             continue
-        # Create relation_matrix describing the feature instances
-        relation_matrix = feature_creation.get_instance_label(faces_list, len(seg_map), inst_label)
-        if len(relation_matrix) != len(faces_list):
+        num_inst_labels = label_utils.instance_label_size(relation_matrix, inst_format)
+        if num_inst_labels != len(faces_list):
             print('generated shape has wrong number of instance labels {} with step faces {}. '.format(
-                len(relation_matrix), len(faces_list)))
+                num_inst_labels, len(faces_list)))
+            trace.fail('wrong number of instance labels')
             continue
-        # Create map between face id and bottom identification label
-        bottom_label = feature_creation.get_segmentation_label(faces_list, bottom_map)
         if len(bottom_label) != len(faces_list):
             print('generated shape has wrong number of bottom labels {} with step faces {}. '.format(
                 len(bottom_label), len(faces_list)))
+            trace.fail('wrong number of bottom labels')
             continue
         # save step and its labels
         shape_name = str(f_name)
@@ -152,26 +184,72 @@ def generate_shape(args):
         step_path = os.path.join(step_path, shape_name + '.step')
         label_path = os.path.join(label_path, shape_name + '.json')
         try:
-            save_shape(shape, step_path, seg_map)
-            save_label(shape_name, label_path, seg_label, relation_matrix, bottom_label)
+            with trace.stage('save_step'):
+                save_shape(shape, step_path, seg_map)
+            with trace.stage('save_label'):
+                save_label(shape_name, label_path, seg_label, relation_matrix, bottom_label, inst_format)
         except Exception as e:
             print('Fail to save:')
             print(e)
+            trace.fail('save ' + type(e).__name__)
             continue
         print('SUCCESS')
-        break  # success
-    return
+        return shape_name, (seg_label, relation_matrix, bottom_label), trace.end(manifest.STATUS_DONE)
+    return str(f_name), None, trace.end(manifest.STATUS_FAILED)
 
 
-def initializer():
+def initializer(occ_threads=0):
     import signal
     """
-    Ignore CTRL+C in the worker process.
+    Ignore CTRL+C in the worker process, cap the OCC threads and load the numba kernels from the on-disk cache.
     """
     signal.signal(signal.SIGINT, signal.SIG_IGN)
+    occ_parallel.configure(occ_threads)
+    geom_utils_nb.warmup()
+
+
+def plan_samples(sub_dataset_dict, num_samples, combo_range, dataset_scale, num_features, tiny_dataset_cand_feats,
+                 cand_feat_weights):
+    """
+    Draws the machining feature combo and the random seed of every sample
+    :return: [{'name', 'subset', 'combo', 'seed'}]
+    """
+    samples = []
+    for sub_dataset in sub_dataset_dict:
+        sub_num_samples = int(num_samples * sub_dataset_dict[sub_dataset])
+        for idx in range(sub_num_samples):
+            num_inter_feat = random.randint(combo_range[0], combo_range[1])
+            if dataset_scale == 'large':
+                combo = [random.randint(0, num_features-1) for _ in range(num_inter_feat)]  # no stock face
+            elif dataset_scale == 'tiny':
+                combo = random.choices(tiny_dataset_cand_feats, weights=cand_feat_weights, k=num_inter_feat)
+
+            samples.append({'name': sub_dataset + '_' + str(idx), 'subset': sub_dataset, 'combo': combo,
+                            'seed': random.getrandbits(32)})
+
+    return samples
+
+
+def restore_label_store(dataset_dir, label_writer, done_names):
+    """
+    Appends the labels of samples which are done but were lost from the shard store by an interruption
+    """
+    for shape_name in done_names:
+        if shape_name in label_writer.index['samples']:
+            continue
+        label_file = os.path.join(dataset_dir, 'labels', shape_name + '.json')
+        _, label = label_utils.load_label(label_file)
+        label_writer.append(shape_name, label['seg'], label['inst'], label['bottom'], label['inst_format'])
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", action='store_true',
+                        help="Continue the run planned in the manifest of the dataset, skipping finished samples")
+    parser.add_argument("--sample", type=str, default=None,
+                        help="Regenerate only this sample of the manifest, from its recorded seed")
+    args = parser.parse_args()
+
     dataset_scale = 'large'
     num_features = 24
     # for tiny dataset, only common features
@@ -183,6 +261,17 @@ if __name__ == '__main__':
     num_samples = 66000
     sub_dataset_dict = {'train': 0.7, 'val': 0.15, 'test': 0.15}
     num_workers = 12
+    # threads each worker gives OCC for meshing and boolean operations, 0 keeps the OCC defaults,
+    # python -m Utils.occ_parallel measures the best split of the cores between workers and OCC threads
+    occ_threads = 0
+    # samples sent to a worker at once, workers are replaced after max_tasks_per_worker chunks to bound the
+    # memory held by OCC
+    chunk_size = 4
+    max_tasks_per_worker = 50
+    # instance label encoding: 'matrix' (dense relation matrix), 'coo' or 'ids', see Utils/labels.py
+    inst_format = 'matrix'
+    # the labels are also appended to a sharded binary store in the parent process, see Utils/label_store.py
+    label_shard_size = 1000
 
     if not os.path.exists(dataset_dir):
         os.mkdir(dataset_dir)
@@ -193,38 +282,67 @@ if __name__ == '__main__':
     if not os.path.exists(label_path):
         os.mkdir(label_path)
 
-    counter = 0
-    for sub_dataset in sub_dataset_dict:
-        sub_num_samples = int(num_samples * sub_dataset_dict[sub_dataset])
-        combos = []
-        for idx in range(sub_num_samples):
-            num_inter_feat = random.randint(combo_range[0], combo_range[1])
-            if dataset_scale == 'large':
-                combo = [random.randint(0, num_features-1) for _ in range(num_inter_feat)]  # no stock face
-            elif dataset_scale == 'tiny':
-                combo = random.choices(tiny_dataset_cand_feats, weights=cand_feat_weights, k=num_inter_feat)
-
-            now = time.localtime()
-            now_time = time.strftime("%Y%m%d_%H%M%S", now)
-            file_name = now_time + '_' + str(idx + counter)
-            combos.append((file_name, combo))
-
-        if num_workers == 1:
-            for combo in combos:
-                generate_shape((dataset_dir, combo, sub_dataset))
-        elif num_workers > 1:  # multiprocessing
-            pool = Pool(processes=num_workers, initializer=initializer)
-            try:
-                result = list(tqdm(pool.imap(generate_shape,
-                                             zip(repeat(dataset_dir), combos, repeat(sub_dataset))), total=len(combos)))
-                print(f'Complete sub dataset {sub_dataset}!')
-            except KeyboardInterrupt:
-                pool.terminate()
-                pool.join()
-        else:
-            AssertionError('error number of workers')
-
-        counter += sub_num_samples
-        gc.collect()
-
+    label_writer = LabelShardWriter(os.path.join(dataset_dir, 'label_shards'), label_shard_size)
+
+    # the plan of all sub datasets is recorded in the manifest and dispatched to a single pool
+    samples = manifest.load_plan(dataset_dir) if args.resume or args.sample is not None else None
+    # a new plan is written below, unless one is resumed or a sample of it regenerated
+    new_plan = samples is None
+    if args.sample is not None:
+        assert samples is not None, 'no manifest in {}'.format(dataset_dir)
+        samples = [sample for sample in samples if sample['name'] == args.sample]
+        assert len(samples) == 1, 'sample {} is not in the manifest'.format(args.sample)
+        status = {}
+    elif samples is None:
+        samples = plan_samples(sub_dataset_dict, num_samples, combo_range, dataset_scale, num_features,
+                               tiny_dataset_cand_feats, cand_feat_weights)
+        manifest.write_plan(dataset_dir, samples)
+        # the labels of a previous plan would be served mixed with the new ones
+        label_writer.reset()
+        status = {}
+    else:
+        # failed samples are skipped as well, their seed would make them fail again
+        status = manifest.load_status(dataset_dir)
+        print(f'Resume: {len(status)} of {len(samples)} samples already finished')
+        restore_label_store(dataset_dir, label_writer,
+                            [name for name in status if status[name] == manifest.STATUS_DONE])
+    tasks = [(dataset_dir, (sample['name'], sample['combo']), sample['subset'], inst_format, sample['seed'])
+             for sample in samples if sample['name'] not in status]
+
+    status_log = manifest.StatusLog(dataset_dir)
+    # per sample stage timings and failure reasons, summarized by Utils/trace.py, the records of a previous plan are
+    # dropped with it
+    trace_log = trace.TraceLog(os.path.join(dataset_dir, 'trace.jsonl'), truncate=new_plan)
+
+    def record(result):
+        shape_name, labels, trace_record = result
+        trace_log.write(trace_record)
+        if labels is not None:
+            label_writer.append(shape_name, *labels, inst_format)
+        status_log.record(shape_name, manifest.STATUS_FAILED if labels is None else manifest.STATUS_DONE)
+
+    if num_workers == 1:
+        occ_parallel.configure(occ_threads)
+        geom_utils_nb.warmup()
+        for task in tasks:
+            record(generate_shape(task))
+    elif num_workers > 1:  # multiprocessing
+        # compiled once in a separate process, the workers load the kernels from the disk cache in initializer(),
+        # the parent never runs the parallel kernels, whose threading layer does not survive a fork
+        geom_utils_nb.fill_cache()
+        pool = Pool(processes=num_workers, initializer=initializer, initargs=(occ_threads,),
+                    maxtasksperchild=max_tasks_per_worker)
+        try:
+            for result in tqdm(pool.imap(generate_shape, tasks, chunksize=chunk_size), total=len(tasks)):
+                record(result)
+            pool.close()
+        except KeyboardInterrupt:
+            pool.terminate()
+        pool.join()
+    else:
+        AssertionError('error number of workers')
+
+    status_log.close()
+    trace_log.close()
+    label_writer.close()
     print('Complete!')
@@ -1,6 +1,8 @@
 import os
 import random
 
+import Utils.manifest as manifest
+
 
 def process_files(folder_path, prefix, output_file, sub_dataset):
     """
@@ -21,7 +23,32 @@ def process_files(folder_path, prefix, output_file, sub_dataset):
             f.write(name + '\n')
 
 
+def process_manifest(dataset_dir):
+    """
+    Writes <subset>.txt files with the samples of the manifest which were generated successfully.
+    dataset_dir (str): path of the dataset written by main.py.
+    """
+    status = manifest.load_status(dataset_dir)
+    subsets = {}
+    for sample in manifest.load_plan(dataset_dir):
+        if status.get(sample['name']) == manifest.STATUS_DONE:
+            subsets.setdefault(sample['subset'], []).append(sample['name'])
+
+    for sub_dataset, file_names in subsets.items():
+        print(f"Number of {sub_dataset} files: {len(file_names)}")
+        random.shuffle(file_names)
+        with open(sub_dataset + '.txt', 'w') as f:
+            for name in file_names:
+                f.write(name + '\n')
+
+
 if __name__ == '__main__':
+    dataset_dir = 'HeteroMF'
+    if manifest.load_plan(dataset_dir) is not None:
+        process_manifest(dataset_dir)
+        exit()
+
+    # datasets generated before the manifest, sub datasets are recovered from the time stamp of the file names
     step_path = 'HeteroMF/steps'
     timestamp = {
         'train': ['20240622_111152'],
@@ -0,0 +1,99 @@
+"""
+The pair pruning of MachiningFeature._bound_1 must not change the accepted bounds.
+
+The candidate loop of _bound_1 is replayed on seeded random face profiles: a planar face above a straight context
+edge with a polyline of random heights opposite of it. The rectangles accepted by the height check are compared
+between all sample pairs and the pairs left by geom_utils.rect_candidate_pairs.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+import Utils.geom_utils as geom_utils
+import Utils.geom_utils_numba as geom_utils_nb
+import Utils.parameters as param
+
+MIN_HEIGHT = param.min_len + param.clearance
+
+
+def random_profile(rng, num_steps=12):
+    """Counter clockwise polygon in the xy plane, from (0, 0) to (length, 0) and back along random heights."""
+    length = rng.uniform(10.0, 40.0)
+    xs = sorted(rng.uniform(0.0, length) for _ in range(num_steps - 1))
+    xs = [length] + xs[::-1] + [0.0]
+    top = [[x, rng.uniform(0.5, 3 * MIN_HEIGHT), 0.0] for x in xs]
+
+    return np.array([[0.0, 0.0, 0.0], [length, 0.0, 0.0]] + top, dtype=np.float64)
+
+
+def edge_samples(verts):
+    """Sample points along the context edge verts[0]-verts[1] and the face boundary above them, as in _bound_1."""
+    segs = np.array([[verts[k], verts[(k + 1) % len(verts)]] for k in range(len(verts))], dtype=np.float64)
+    pnt1, pnt2 = verts[0], verts[1]
+    edge_len = np.linalg.norm(pnt2 - pnt1)
+    edge_unit_dir = (pnt2 - pnt1) / edge_len
+    pnt1 = pnt1 + param.clearance * edge_unit_dir
+    pnt2 = pnt2 - param.clearance * edge_unit_dir
+    edge_len -= 2 * param.clearance
+    edge_normal = np.cross(np.array([0.0, 0.0, 1.0]), edge_unit_dir)
+
+    num_sample = int(edge_len / param.min_len)
+    sample_pnts = [pnt1 + t * param.min_len * edge_unit_dir for t in range(num_sample)]
+    sample_pnts.append(pnt2)
+    sample_pnts = np.array(sample_pnts, dtype=np.float64)
+
+    inter_pnts = []
+    for pnt in sample_pnts:
+        intersects = geom_utils_nb.ray_segment_set_intersect(pnt, edge_normal, segs)
+        intersects.sort()
+        inter_pnts.append(pnt + intersects[intersects > 0][0] * edge_normal)
+    inter_pnts = np.array(inter_pnts, dtype=np.float64)
+    pts = np.append(verts, inter_pnts, axis=0)
+
+    return sample_pnts, inter_pnts, pts
+
+
+def accepted_bounds(sample_pnts, inter_pnts, pts, pairs):
+    """{(i, j): rectangle} of the pairs whose rectangle passes the height check of _edge_bound_between."""
+    result = {}
+    for i, j in pairs:
+        vec1 = inter_pnts[i] - sample_pnts[i]
+        vec2 = inter_pnts[j] - sample_pnts[j]
+        verts = np.array([sample_pnts[i] + vec1, sample_pnts[i], sample_pnts[j], sample_pnts[j] + vec2])
+        bound = geom_utils_nb.search_rect_inside_bound_1(verts, vec1, vec2, pts)
+        if bound is not None and np.linalg.norm(bound[1] - bound[0]) >= MIN_HEIGHT:
+            result[(i, j)] = bound
+
+    return result
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_pruning_keeps_accepted_bounds(seed):
+    rng = random.Random(seed)
+    sample_pnts, inter_pnts, pts = edge_samples(random_profile(rng))
+    heights = np.linalg.norm(inter_pnts - sample_pnts, axis=1)
+
+    num_samples = sample_pnts.shape[0]
+    all_pairs = [(i, j) for i in range(num_samples - 1) for j in range(i + 1, num_samples)]
+    pruned_pairs = list(geom_utils.rect_candidate_pairs(heights, MIN_HEIGHT))
+    assert set(pruned_pairs) <= set(all_pairs)
+
+    expected = accepted_bounds(sample_pnts, inter_pnts, pts, all_pairs)
+    result = accepted_bounds(sample_pnts, inter_pnts, pts, pruned_pairs)
+    assert result.keys() == expected.keys()
+    for pair, bound in expected.items():
+        np.testing.assert_allclose(result[pair], bound)
+
+
+def test_pruning_skips_pairs():
+    num_pruned = 0
+    for seed in range(20):
+        sample_pnts, inter_pnts, pts = edge_samples(random_profile(random.Random(seed)))
+        heights = np.linalg.norm(inter_pnts - sample_pnts, axis=1)
+        num_samples = sample_pnts.shape[0]
+        num_pruned += num_samples * (num_samples - 1) // 2 - len(list(geom_utils.rect_candidate_pairs(heights,
+                                                                                                       MIN_HEIGHT)))
+
+    assert num_pruned > 0
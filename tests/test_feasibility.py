@@ -0,0 +1,43 @@
+"""
+MachiningFeature._infeasible_reason must only reject shapes on which no bound of the bound type exists.
+"""
+
+import pytest
+
+pytest.importorskip('OCC')
+
+from OCC.Core.gp import gp_Pnt, gp_Vec
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakePolygon, BRepBuilderAPI_MakeFace
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakePrism
+
+import Utils.parameters as param
+from Features.machining_features import MachiningFeature
+
+
+def trapezoid_prism():
+    """Thin prism on a trapezoid with one long slanted side, a long base and two short sides.
+
+    Only the two longest straight edges of each face reach min_len, the top face still holds a bound of type 3
+    between its slanted side and its base.
+    """
+    polygon = BRepBuilderAPI_MakePolygon()
+    for x, y in [(10.0, 1.5), (0.0, 0.0), (10.0, 0.0), (11.0, 1.5)]:
+        polygon.Add(gp_Pnt(x, y, 0.0))
+    polygon.Close()
+    face = BRepBuilderAPI_MakeFace(polygon.Wire()).Face()
+
+    return BRepPrimAPI_MakePrism(face, gp_Vec(0.0, 0.0, 1.5)).Shape()
+
+
+def test_bound_3_on_trapezoid_is_not_pruned():
+    feature = MachiningFeature(trapezoid_prism(), None, param.min_len, param.clearance, param.feat_names)
+    feature.bound_type = 3
+    for face in feature.state.planar_faces:
+        assert len(feature.state.line_edge_lengths(face)) == 4
+        assert feature.state.line_edge_lengths(face)[2] < param.min_len
+
+    assert feature._infeasible_reason() is None
+
+    feature.state.triangulate()
+    feature._get_bounds()
+    assert len(feature.bounds) > 0